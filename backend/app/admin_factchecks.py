@@ -9,6 +9,7 @@ import logging
 from app.db import get_db
 from app import models
 from app.auth_admin import admin_required
+from app.routers.analytics import remember_check_created
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +58,7 @@ async def create_fact_check(
         db.add(check)
         db.commit()
         db.refresh(check)
+        remember_check_created(check)
         
         logger.info(f"Admin created fact-check: {check_id}")
         return check
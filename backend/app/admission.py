@@ -0,0 +1,68 @@
+"""Admission control for slow endpoints (per worker process).
+
+A controller admits at most `max_in_flight` concurrent requests. When the
+median latency of recent requests rises above `target_latency`, the limit
+shrinks in proportion (Little's law: same throughput, fewer requests
+stuck waiting), down to one. Requests over the limit are shed at once
+instead of queueing behind a slow upstream, so they don't take threads,
+DB sessions and event-loop time from the cheap endpoints.
+"""
+import math
+import statistics
+import threading
+from collections import deque
+from typing import Optional
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_in_flight: int, target_latency: float, window: int = 50):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.deferred = 0  # shed requests handed to the async job path instead
+
+    def recent_latency(self) -> Optional[float]:
+        return statistics.median(self._latencies) if self._latencies else None
+
+    def limit(self) -> int:
+        latency = self.recent_latency()
+        if latency is None or latency <= self.target_latency:
+            return self.max_in_flight
+        return max(1, math.floor(self.max_in_flight * self.target_latency / latency))
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit():
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self, elapsed: float):
+        with self._lock:
+            self.in_flight -= 1
+            self._latencies.append(elapsed)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: about one recent request duration"""
+        return max(1, min(120, math.ceil(self.recent_latency() or self.target_latency)))
+
+    def stats(self) -> dict:
+        latency = self.recent_latency()
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "limit": self.limit(),
+            "max_in_flight": self.max_in_flight,
+            "median_latency_s": round(latency, 3) if latency is not None else None,
+            "target_latency_s": self.target_latency,
+            "admitted_total": self.admitted,
+            "shed_total": self.shed,
+            "deferred_total": self.deferred,
+        }
@@ -0,0 +1,204 @@
+"""Long-term analytics history in Postgres.
+
+Redis keeps engagement for 48 h only. Once an hour has settled, the
+rollup job turns its Redis aggregates into compact rows: one
+`FactCheckHourlyStats` per fact-check (unique readers from the hourly
+HLL plus open/share/read_complete counters) and one `SearchTermHourly`
+per term of the hour's trending top-k. Rows are bulk inserted, and a
+Redis watermark records the last hour written. The query helpers below
+serve 30/90-day ranges from these rows.
+
+`uniques` is per hour. Summed over a range it counts reader-hours, not
+distinct readers.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.settings import settings
+from app.trending import top_key
+
+COUNTS_TTL = 60 * 60 * 72
+WATERMARK_KEY = "analytics:pg_rollup:last_hour"
+SETTLE_MINUTES = 10  # let stream consumers catch up before an hour is frozen
+METRICS = ("uniques", "opens", "shares", "read_completes")
+_COUNTER_COLUMNS = {"open": "opens", "share": "shares", "read_complete": "read_completes"}
+
+
+def counts_key(hour: str) -> str:
+    """Hash of per-hour event counters, field "{type}:{fact_check_id}" """
+    return f"fc:counts:{hour}"
+
+
+def _tag(hour: datetime) -> str:
+    return hour.strftime("%Y%m%d%H")
+
+
+def collect_hour(r, hour: datetime) -> Tuple[List[Dict], List[Dict]]:
+    """Rows for one finished hour, read with two pipelined round trips"""
+    tag = _tag(hour)
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall(counts_key(tag))
+    pipe.zrevrange(top_key(tag), 0, -1, withscores=True)
+    counters, terms = pipe.execute()
+
+    per_check: Dict[str, Dict[str, int]] = defaultdict(lambda: {c: 0 for c in _COUNTER_COLUMNS.values()})
+    for field, value in counters.items():
+        event_type, _, fc_id = field.partition(":")
+        if event_type in _COUNTER_COLUMNS and fc_id:
+            per_check[fc_id][_COUNTER_COLUMNS[event_type]] += int(value)
+
+    ids = list(per_check)
+    pipe = r.pipeline(transaction=False)
+    for fc_id in ids:
+        pipe.pfcount(f"fc:{fc_id}:hll:{tag}")
+    uniques = pipe.execute() if ids else []
+
+    naive_hour = hour.replace(tzinfo=None)  # coloanele DateTime sunt naive UTC
+    check_rows = [
+        {"fact_check_id": fc_id, "hour": naive_hour, "uniques": int(n), **per_check[fc_id]}
+        for fc_id, n in zip(ids, uniques)
+    ]
+    term_rows = [{"hour": naive_hour, "term": term[:100], "count": int(count)} for term, count in terms]
+    return check_rows, term_rows
+
+
+def persist_hourly_rollups(r, db: Session, now: Optional[datetime] = None) -> dict:
+    """Write every settled hour after the watermark; re-running an hour replaces its rows"""
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    last_settled = (now - timedelta(hours=1, minutes=SETTLE_MINUTES)).replace(minute=0, second=0, microsecond=0)
+
+    watermark = r.get(WATERMARK_KEY)
+    if watermark:
+        next_hour = datetime.strptime(watermark, "%Y%m%d%H").replace(tzinfo=timezone.utc) + timedelta(hours=1)
+    else:
+        next_hour = last_settled - timedelta(hours=settings.HLL_HOURLY_KEEP_HOURS - 1)
+    # Older hours are no longer in Redis at hourly resolution
+    next_hour = max(next_hour, last_settled - timedelta(hours=settings.HLL_HOURLY_KEEP_HOURS - 1))
+
+    hours = check_rows_total = term_rows_total = 0
+    hour = next_hour
+    while hour <= last_settled:
+        check_rows, term_rows = collect_hour(r, hour)
+        naive_hour = hour.replace(tzinfo=None)
+        try:
+            db.execute(delete(models.FactCheckHourlyStats).where(models.FactCheckHourlyStats.hour == naive_hour))
+            db.execute(delete(models.SearchTermHourly).where(models.SearchTermHourly.hour == naive_hour))
+            if check_rows:
+                db.execute(models.FactCheckHourlyStats.__table__.insert(), check_rows)
+            if term_rows:
+                db.execute(models.SearchTermHourly.__table__.insert(), term_rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        r.set(WATERMARK_KEY, _tag(hour))
+        hours += 1
+        check_rows_total += len(check_rows)
+        term_rows_total += len(term_rows)
+        hour += timedelta(hours=1)
+
+    return {
+        "hours": hours,
+        "fact_check_rows": check_rows_total,
+        "search_term_rows": term_rows_total,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _range(start: Optional[datetime], end: Optional[datetime], days: int) -> Tuple[datetime, datetime]:
+    end = (end or datetime.utcnow()).replace(tzinfo=None)
+    start = (start.replace(tzinfo=None) if start else end - timedelta(days=days))
+    return start, end
+
+
+def top_fact_checks(
+    db: Session,
+    metric: str = "uniques",
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 20,
+) -> List[Dict]:
+    """Checks ranked by a summed metric over the range (index range scan on `hour`)"""
+    start, end = _range(start, end, days)
+    stats = models.FactCheckHourlyStats
+    totals = (
+        db.query(
+            stats.fact_check_id,
+            *[func.sum(getattr(stats, m)).label(m) for m in METRICS],
+        )
+        .filter(stats.hour >= start, stats.hour < end)
+        .group_by(stats.fact_check_id)
+        .order_by(func.sum(getattr(stats, metric)).desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = (
+        db.query(totals, models.Check.title, models.Check.category)
+        .outerjoin(models.Check, models.Check.id == totals.c.fact_check_id)
+        .order_by(getattr(totals.c, metric).desc())
+        .all()
+    )
+    return [
+        {
+            "fact_check_id": row.fact_check_id,
+            "title": row.title,
+            "category": row.category,
+            **{m: int(getattr(row, m) or 0) for m in METRICS},
+        }
+        for row in rows
+    ]
+
+
+def fact_check_history(
+    db: Session,
+    fact_check_id: str,
+    granularity: str = "day",
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict]:
+    """Hourly rows for one check (primary key range), optionally summed per day"""
+    start, end = _range(start, end, days)
+    stats = models.FactCheckHourlyStats
+    rows = (
+        db.query(stats)
+        .filter(stats.fact_check_id == fact_check_id, stats.hour >= start, stats.hour < end)
+        .order_by(stats.hour)
+        .all()
+    )
+    buckets: Dict[datetime, Dict[str, int]] = {}
+    for row in rows:
+        key = row.hour if granularity == "hour" else row.hour.replace(hour=0)
+        bucket = buckets.setdefault(key, {m: 0 for m in METRICS})
+        for m in METRICS:
+            bucket[m] += getattr(row, m) or 0
+    return [{"start": key.isoformat(), **values} for key, values in buckets.items()]
+
+
+def top_search_terms(
+    db: Session,
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 50,
+) -> List[Dict]:
+    start, end = _range(start, end, days)
+    terms = models.SearchTermHourly
+    total = func.sum(terms.count)
+    rows = (
+        db.query(terms.term, total.label("count"))
+        .filter(terms.hour >= start, terms.hour < end)
+        .group_by(terms.term)
+        .order_by(total.desc())
+        .limit(limit)
+        .all()
+    )
+    return [{"query": row.term, "count": int(row.count)} for row in rows]
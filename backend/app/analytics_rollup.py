@@ -0,0 +1,124 @@
+"""Analytics key maintenance: hourly → daily HLL rollups and a Redis memory report.
+
+Hourly reader sketches `fc:{id}:hll:{YYYYMMDDHH}` are only needed at full
+resolution for the recent window used by hot scoring. Older hours are
+merged into one daily sketch per fact-check, `fc:{id}:hll:d:{YYYYMMDD}`,
+and deleted.
+"""
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.settings import settings
+
+HOURLY_PATTERN = "fc:*:hll:[0-9]?????????"  # daily keys start with "d:"
+_HOURLY_RE = re.compile(r"^fc:(?P<id>.+):hll:(?P<hour>\d{10})$")
+
+
+def daily_key(fact_check_id: str, day: str) -> str:
+    return f"fc:{fact_check_id}:hll:d:{day}"
+
+
+def _as_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def rollup_hourly_sketches(r, now: Optional[datetime] = None, batch: int = 500) -> dict:
+    """Merge finished hours older than HLL_HOURLY_KEEP_HOURS into daily sketches"""
+    now = now or datetime.now(timezone.utc)
+    started = time.perf_counter()
+    cutoff = (now - timedelta(hours=settings.HLL_HOURLY_KEEP_HOURS)).strftime("%Y%m%d%H")
+    daily_ttl = settings.HLL_DAILY_RETENTION_DAYS * 24 * 3600
+
+    # (fact-check id, day) -> hourly keys to fold in
+    groups: Dict[tuple, List[str]] = defaultdict(list)
+    for key in r.scan_iter(match=HOURLY_PATTERN, count=1000):
+        key = _as_str(key)
+        m = _HOURLY_RE.match(key)
+        if m and m.group("hour") < cutoff:
+            groups[(m.group("id"), m.group("hour")[:8])].append(key)
+
+    merged_hours = 0
+    items = list(groups.items())
+    for start in range(0, len(items), batch):
+        pipe = r.pipeline(transaction=False)
+        for (fc_id, day), keys in items[start:start + batch]:
+            target = daily_key(fc_id, day)
+            pipe.pfmerge(target, target, *keys)
+            pipe.expire(target, daily_ttl)
+            pipe.delete(*keys)
+            merged_hours += len(keys)
+        pipe.execute()
+
+    return {
+        "hours_merged": merged_hours,
+        "daily_sketches": len(groups),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def key_family(key: str) -> str:
+    if key.startswith("fc:"):
+        if _HOURLY_RE.match(key):
+            return "fc:hll:hourly"
+        if ":hll:d:" in key:
+            return "fc:hll:daily"
+        return "fc:other"
+    for prefix in ("user_stories_read:", "user_stories_shared:", "user_questions:"):
+        if key.startswith(prefix):
+            return f"user_*:{prefix[:-1]}"
+    for prefix in ("search:", "hot:", "votes:", "build_check:", "rq:"):
+        if key.startswith(prefix):
+            return f"{prefix}*"
+    return "other"
+
+
+def memory_report(r, sample_per_family: int = 200) -> dict:
+    """Key counts per family plus MEMORY USAGE on a sample, extrapolated to the family"""
+    started = time.perf_counter()
+    counts: Dict[str, int] = defaultdict(int)
+    samples: Dict[str, List[str]] = defaultdict(list)
+    for key in r.scan_iter(count=1000):
+        key = _as_str(key)
+        family = key_family(key)
+        counts[family] += 1
+        if len(samples[family]) < sample_per_family:
+            samples[family].append(key)
+
+    pipe = r.pipeline(transaction=False)
+    order = []
+    for family, keys in samples.items():
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+            order.append(family)
+    sampled_bytes: Dict[str, List[int]] = defaultdict(list)
+    # MEMORY USAGE may be disabled (managed Redis); counts are still reported
+    for family, used in zip(order, pipe.execute(raise_on_error=False)):
+        if isinstance(used, int):
+            sampled_bytes[family].append(int(used))
+
+    families = {}
+    for family, n in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+        sizes = sampled_bytes.get(family, [])
+        avg = sum(sizes) / len(sizes) if sizes else 0.0
+        families[family] = {
+            "keys": n,
+            "sampled": len(sizes),
+            "avg_bytes": round(avg, 1),
+            "est_bytes": int(avg * n),
+        }
+
+    try:
+        info = r.info("memory")
+    except Exception:
+        info = {}
+    return {
+        "total_keys": sum(counts.values()),
+        "est_bytes": sum(f["est_bytes"] for f in families.values()),
+        "used_memory": info.get("used_memory"),
+        "used_memory_human": info.get("used_memory_human"),
+        "families": families,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,340 @@
+"""Build-check pipeline for vote-triggered questions.
+
+`BuildCheckExecutor` pulls RQ jobs from the priority queues and keeps up
+to BUILD_CHECK_CONCURRENCY Gemini generations in flight in one asyncio
+loop. Finished checks are buffered and committed in bulk.
+
+In-flight jobs sit in their queue's StartedJobRegistry with a short
+expiry that a heartbeat keeps pushing forward. If an executor dies, its
+entries expire and any executor (this one at startup, then every
+heartbeat) puts those jobs back on their queue, up to
+BUILD_CHECK_MAX_ATTEMPTS times, after which they are failed like any
+RQ job (FailedJobRegistry, claim released).
+"""
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from rq import Queue
+from rq.exceptions import DequeueTimeout, NoSuchJobError
+from rq.job import Job, JobStatus
+from rq.registry import FailedJobRegistry, StartedJobRegistry
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import SessionLocal
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 20  # seconds between registry refreshes / abandoned-job sweeps
+HEARTBEAT_TTL = 90  # a registry entry not refreshed for this long belongs to a dead executor
+
+
+@dataclass
+class BuildResult:
+    question_id: str
+    check: Optional[Dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+    job: Optional[Job] = None
+
+
+def load_question_title(question_id: str) -> Optional[str]:
+    """Short-lived session so no connection is held while Gemini runs"""
+    db: Session = SessionLocal()
+    try:
+        q = db.get(models.Question, question_id)
+        if not q or q.checks:
+            return None
+        return q.title
+    finally:
+        db.close()
+
+
+async def generate_check(question_id: str, title: str) -> Dict:
+    """Run the Gemini generation and map it onto a Check row"""
+    from app.services.gemini_service import gemini_service
+
+    ai_result = await gemini_service.generate_fact_check(title, strict=True)
+    now = datetime.utcnow()
+    return {
+        "id": f"c_{uuid.uuid4().hex[:10]}",
+        "question_id": question_id,
+        "title": title,
+        "verdict": ai_result["verdict"],
+        "confidence": ai_result["confidence"],
+        "summary": ai_result["summary"],
+        "category": ai_result["category"],
+        "sources": ai_result.get("sources", []),
+        "auto_generated": True,
+        "status": "draft",  # rămâne draft până la publish manual
+        "published_at": None,
+        "created_at": now,
+    }
+
+
+async def build_one(question_id: str, max_attempts: int, budget: Optional[float] = None) -> BuildResult:
+    """Generate with retries; with a `budget` (seconds, normally the job timeout) attempts
+    and backoff together never run past it"""
+    result = BuildResult(question_id=question_id)
+    started = time.perf_counter()
+    deadline = started + budget if budget else None
+    title = await asyncio.to_thread(load_question_title, question_id)
+    if title is None:
+        return result  # întrebare ștearsă sau deja verificată
+
+    for attempt in range(1, max_attempts + 1):
+        result.attempts = attempt
+        remaining = deadline - time.perf_counter() if deadline else None
+        try:
+            result.check = await asyncio.wait_for(generate_check(question_id, title), timeout=remaining)
+            result.error = None
+            break
+        except asyncio.TimeoutError:
+            result.error = f"timed out after {budget}s"
+            break
+        except Exception as e:
+            result.error = str(e)[:500]
+            if attempt < max_attempts:
+                delay = min(60, 5 * 2 ** (attempt - 1))
+                if deadline and time.perf_counter() + delay >= deadline:
+                    break  # no room for another attempt within the budget
+                await asyncio.sleep(delay)
+    result.timings["generate_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def commit_checks(db: Session, checks: List[Dict]) -> int:
+    """Bulk insert checks and mark their questions checked; skips questions checked meanwhile"""
+    if not checks:
+        return 0
+    question_ids = [c["question_id"] for c in checks]
+    already = {
+        row[0] for row in
+        db.query(models.Check.question_id).filter(models.Check.question_id.in_(question_ids)).all()
+    }
+    rows = [c for c in checks if c["question_id"] not in already]
+    if rows:
+        db.execute(models.Check.__table__.insert(), rows)
+        db.execute(
+            update(models.Question)
+            .where(models.Question.id.in_([c["question_id"] for c in rows]))
+            .values(status="checked")
+        )
+    db.commit()
+    if rows:
+        from app.hot_scores import remember_created_at
+        from app.worker import rq_connection
+        remember_created_at(rq_connection(), {c["id"]: c["created_at"] for c in rows})
+    return len(rows)
+
+
+def build_check_sync(question_id: str):
+    """Single-job path used by the classic RQ worker (`run_build_check`)"""
+    from app.worker import BUILD_JOB_TIMEOUT
+
+    # Stop retrying before RQ kills the work-horse at the job timeout
+    result = asyncio.run(build_one(question_id, settings.BUILD_CHECK_MAX_ATTEMPTS, budget=BUILD_JOB_TIMEOUT - 10))
+    if result.error:
+        raise RuntimeError(f"Build check failed for {question_id}: {result.error}")
+    if result.check:
+        db: Session = SessionLocal()
+        try:
+            commit_checks(db, [result.check])
+        finally:
+            db.close()
+
+
+class BuildCheckExecutor:
+    def __init__(
+        self,
+        queues: List[Queue],
+        concurrency: int = settings.BUILD_CHECK_CONCURRENCY,
+        batch_size: int = settings.BUILD_CHECK_COMMIT_BATCH,
+        flush_interval: float = settings.BUILD_CHECK_COMMIT_INTERVAL,
+    ):
+        self.queues = queues
+        self.connection = queues[0].connection
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending: List[BuildResult] = []
+        self._tasks: set = set()
+        self._in_flight: Dict[str, Job] = {}
+        self.completed = 0
+        self.failed = 0
+        self.recovered = 0
+
+    def _started_registry(self, queue_name: str) -> StartedJobRegistry:
+        return StartedJobRegistry(queue_name, connection=self.connection)
+
+    def _heartbeat(self):
+        """Push in-flight registry entries forward, then recover jobs of dead executors"""
+        with self.connection.pipeline() as pipe:
+            for job in list(self._in_flight.values()):
+                self._started_registry(job.origin).add(job, HEARTBEAT_TTL, pipeline=pipe)
+            pipe.execute()
+        for queue in self.queues:
+            registry = self._started_registry(queue.name)
+            for job_id in registry.get_expired_job_ids():
+                # ZREM decides which executor owns the recovery when several sweep at once
+                if job_id in self._in_flight or not self.connection.zrem(registry.key, job_id):
+                    continue
+                self._recover(queue, job_id)
+
+    def _recover(self, queue: Queue, job_id: str):
+        try:
+            job = Job.fetch(job_id, connection=self.connection)
+        except NoSuchJobError:
+            return
+        job.meta["abandoned"] = job.meta.get("abandoned", 0) + 1
+        job.save_meta()
+        question_id = job.args[0]
+        if job.meta["abandoned"] >= settings.BUILD_CHECK_MAX_ATTEMPTS:
+            logger.error(f"Build check {question_id} abandoned {job.meta['abandoned']}x, failing it")
+            self._finish_job(job, question_id, ok=False, meta={"error": "abandoned by a dead executor"}, counted=False)
+            return
+        queue.enqueue_job(job)
+        self.recovered += 1
+        print(f"♻️ Requeued abandoned build_check {question_id} (attempt {job.meta['abandoned'] + 1})")
+
+    async def _heartbeat_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._heartbeat)
+            except Exception as e:
+                logger.warning(f"Build-check heartbeat failed: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def _dequeue(self) -> Optional[Job]:
+        try:
+            found = Queue.dequeue_any(self.queues, timeout=5, connection=self.connection)
+        except DequeueTimeout:
+            return None
+        return found[0] if found else None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # generate_fact_check uses asyncio.to_thread; size the pool for N calls in flight
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency + 4))
+        flusher = asyncio.create_task(self._flush_loop())
+        heartbeat = asyncio.create_task(self._heartbeat_loop())  # first sweep recovers jobs left by a crash
+        print(f"🚀 Build-check executor: {self.concurrency} in flight, batch {self.batch_size}")
+        try:
+            while True:
+                await self._slots.acquire()
+                job = await asyncio.to_thread(self._dequeue)
+                if job is None:
+                    self._slots.release()
+                    continue
+                task = asyncio.create_task(self._process(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            flusher.cancel()
+            heartbeat.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._flush()
+
+    async def _process(self, job: Job):
+        from app.worker import BUILD_JOB_TIMEOUT
+
+        question_id = job.args[0]
+        timeout = job.timeout or BUILD_JOB_TIMEOUT
+        self._in_flight[job.id] = job
+        try:
+            await asyncio.to_thread(self._mark_started, job)
+            # The budget ends retries in time; wait_for is the hard stop (heartbeats keep the job alive until then)
+            result = await asyncio.wait_for(
+                build_one(question_id, settings.BUILD_CHECK_MAX_ATTEMPTS, budget=timeout),
+                timeout=timeout,
+            )
+            result.job = job
+            if job.enqueued_at:
+                enqueued_at = job.enqueued_at.replace(tzinfo=timezone.utc)
+                result.timings["queued_s"] = round((datetime.now(timezone.utc) - enqueued_at).total_seconds(), 3)
+            self._pending.append(result)
+            if len(self._pending) >= self.batch_size:
+                await self._flush()
+        except Exception as e:
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)[:500]
+            logger.exception(f"Build check crashed for {question_id}: {error}")
+            await asyncio.to_thread(self._finish_job, job, question_id, False, {"error": error})
+        finally:
+            self._slots.release()
+
+    def _mark_started(self, job: Job):
+        with self.connection.pipeline() as pipe:
+            job.set_status(JobStatus.STARTED, pipeline=pipe)
+            self._started_registry(job.origin).add(job, HEARTBEAT_TTL, pipeline=pipe)
+            pipe.execute()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _flush(self):
+        # Swap on the loop thread so no result appended meanwhile is lost
+        batch, self._pending = self._pending, []
+        if batch:
+            await asyncio.to_thread(self._commit_batch, batch)
+
+    def _commit_batch(self, batch: List[BuildResult]):
+        checks = [r.check for r in batch if r.check]
+        started = time.perf_counter()
+        db: Session = SessionLocal()
+        try:
+            written = commit_checks(db, checks)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk commit of {len(checks)} checks failed: {e}")
+            for r in batch:
+                r.error = r.error or f"commit failed: {e}"
+            written = 0
+        finally:
+            db.close()
+        commit_s = round(time.perf_counter() - started, 3)
+
+        for r in batch:
+            r.timings["commit_s"] = commit_s
+            ok = r.error is None
+            meta = {"timings": r.timings, "attempts": r.attempts, "error": r.error}
+            self._finish_job(r.job, r.question_id, ok=ok, meta=meta)
+            print(f"{'✅' if ok else '❌'} build_check {r.question_id} {r.timings} attempts={r.attempts}"
+                  + (f" error={r.error}" if r.error else ""))
+        print(f"📦 Committed {written} checks ({len(batch)} jobs) in {commit_s}s "
+              f"— done={self.completed} failed={self.failed}")
+
+    def _finish_job(self, job: Optional[Job], question_id: str, ok: bool, meta: Dict, counted: bool = True):
+        from app.worker import release_build_check
+
+        if counted and ok:
+            self.completed += 1
+        elif counted:
+            self.failed += 1
+        if job is not None:
+            self._in_flight.pop(job.id, None)
+            try:
+                job.meta.update(meta)
+                job.save_meta()
+                with self.connection.pipeline() as pipe:
+                    self._started_registry(job.origin).remove(job, pipeline=pipe)
+                    job.set_status(JobStatus.FINISHED if ok else JobStatus.FAILED, pipeline=pipe)
+                    if not ok:
+                        FailedJobRegistry(job.origin, connection=self.connection).add(
+                            job, ttl=job.failure_ttl, exc_string=meta.get("error") or "", pipeline=pipe
+                        )
+                    pipe.execute()
+            except Exception as e:
+                logger.warning(f"Could not update job {job.id}: {e}")
+        release_build_check(question_id)
@@ -1,10 +1,148 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, NullPool
+from app.metrics import instrument_engine
 from app.settings import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+class PoolStats:
+    """Per-process counters for the connection pool (one pool per uvicorn worker)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.overflow_checkouts = 0
+            self.overflow_peak = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            data = {
+                "pid": os.getpid(),
+                "pool_class": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total * 1000, 2),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 2),
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_peak": self.overflow_peak,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            })
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class _TimedGetMixin:
+    """Measures how long a checkout waits for a connection (queue wait or fresh connect)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedGetMixin, NullPool):
+    pass
+
+
+def _engine_kwargs(database_url: str) -> dict:
+    url = make_url(database_url)
+    kwargs = {"pool_pre_ping": True}
+
+    if settings.DB_PGBOUNCER:
+        # PgBouncer (transaction mode) owns pooling: no client-side pool and
+        # no server-side prepared statements, which don't survive across backends.
+        kwargs["poolclass"] = InstrumentedNullPool
+        if url.get_driver_name() == "psycopg":
+            kwargs["connect_args"] = {"prepare_threshold": None}
+        return kwargs
+
+    kwargs.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return kwargs
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+instrument_engine(engine)
+
+
+@event.listens_for(engine.pool, "connect")
+def _on_connect(dbapi_conn, conn_record):
+    pool_stats.record_connect()
+
+
+@event.listens_for(engine.pool, "checkout")
+def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+    overflow = engine.pool.overflow() if isinstance(engine.pool, QueuePool) else 0
+    pool_stats.record_checkout(overflow)
+
+
+@event.listens_for(engine.pool, "checkin")
+def _on_checkin(dbapi_conn, conn_record):
+    pool_stats.record_checkin()
+
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,205 @@
+"""Near-duplicate detection for submitted questions.
+
+Similarity is Jaccard over character trigrams of the normalized title.
+Postgres computes it with pg_trgm (`%` operator, GIN index on the
+diacritic-folded title). Other databases, and Postgres when pg_trgm or
+unaccent couldn't be set up, use an in-process MinHash/LSH index built
+lazily from the questions table and verified exactly.
+
+Trigrams can't tell "în 2004" from "în 2007" or "conțin" from "nu conțin",
+so a submission is only folded into an existing question when it is very
+similar AND both titles carry the same numbers and negations
+(`same_claim`). Anything else above QUESTION_SUGGEST_THRESHOLD is only
+offered to the submitter as a possible duplicate.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import models
+from app.settings import settings
+from app.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Questions a new submission can be folded into
+MATCHABLE_STATUSES = ("open", "queued", "checked")
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+# Normalized (diacritic-free) negation words; "n-a" normalizes to "n a"
+NEGATIONS = frozenset({"nu", "n", "nici", "niciun", "nicio", "niciodata", "nimeni", "nimic", "fara", "not", "no"})
+
+_PG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() is only STABLE; an IMMUTABLE wrapper is needed to index it
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_questions_title_trgm ON questions USING GIN (f_unaccent(lower(title)) gin_trgm_ops)",
+]
+
+
+def ensure_similarity_index(engine: Engine) -> bool:
+    """Create the trigram index on Postgres (idempotent, called at startup).
+
+    Returns whether pg_trgm matching is usable; if not, `question_deduper`
+    falls back to the in-process index.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.begin() as conn:
+            for stmt in _PG_SETUP:
+                conn.execute(text(stmt))
+    except Exception as e:
+        logger.warning(f"Could not set up question similarity index, using the in-process index: {e}")
+        question_deduper.pg_trigram = False
+        return False
+    question_deduper.pg_trigram = True
+    return True
+
+
+def trigrams(value: str) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces in front, one behind"""
+    grams = set()
+    for word in normalize_text(value).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def claim_markers(value: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Numbers and negation words of a title: claims differing in these are different claims"""
+    normalized = normalize_text(value)
+    numbers = frozenset(n.replace(",", ".") for n in _NUMBER.findall(normalized))
+    return numbers, frozenset(w for w in normalized.split() if w in NEGATIONS)
+
+
+def same_claim(a: str, b: str, score: float) -> bool:
+    """Safe to fold `a` into `b` without asking the submitter"""
+    return score >= settings.QUESTION_DEDUPE_THRESHOLD and claim_markers(a) == claim_markers(b)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """MinHash signatures banded into LSH buckets; candidates are re-scored exactly"""
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        assert num_perm % bands == 0
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME)) for _ in range(num_perm)]
+        self._buckets: List[Dict[Tuple[int, ...], Set[str]]] = [dict() for _ in range(bands)]
+        self._grams: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._grams)
+
+    def _signature(self, grams: Set[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big") for g in grams]
+        return [min((a * h + b) % self._PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, grams: Set[str]):
+        sig = self._signature(grams)
+        for band in range(self.bands):
+            yield band, tuple(sig[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: str, value: str):
+        grams = trigrams(value)
+        if not grams:
+            return
+        with self._lock:
+            self._grams[key] = grams
+            for band, band_key in self._band_keys(grams):
+                self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def query(self, value: str, threshold: float) -> List[Tuple[str, float]]:
+        """Keys whose exact trigram Jaccard with `value` is >= threshold, best first"""
+        grams = trigrams(value)
+        if not grams:
+            return []
+        with self._lock:
+            candidates = set()
+            for band, band_key in self._band_keys(grams):
+                candidates |= self._buckets[band].get(band_key, set())
+            scored = [(key, jaccard(grams, self._grams[key])) for key in candidates]
+        return sorted([s for s in scored if s[1] >= threshold], key=lambda s: s[1], reverse=True)
+
+
+class QuestionDeduper:
+    def __init__(self):
+        self._index: Optional[MinHashLSH] = None
+        self._lock = threading.Lock()
+        self.pg_trigram = False  # set by ensure_similarity_index once pg_trgm/f_unaccent exist
+
+    def _local_index(self, db: Session) -> MinHashLSH:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = MinHashLSH()
+                    rows = (
+                        db.query(models.Question.id, models.Question.title)
+                        .filter(models.Question.status.in_(MATCHABLE_STATUSES))
+                        .order_by(models.Question.created_at.desc())
+                        .limit(settings.QUESTION_DEDUPE_INDEX_SIZE)
+                        .all()
+                    )
+                    for qid, title in rows:
+                        index.add(qid, title)
+                    logger.info(f"Built MinHash question index with {len(index)} entries")
+                    self._index = index
+        return self._index
+
+    def find_similar(self, db: Session, title: str) -> Optional[Tuple[models.Question, float]]:
+        """Most similar matchable question at or above QUESTION_SUGGEST_THRESHOLD, if any"""
+        threshold = settings.QUESTION_SUGGEST_THRESHOLD
+        if self.pg_trigram and db.get_bind().dialect.name == "postgresql":
+            row = db.execute(
+                text(
+                    """
+                    SELECT id, similarity(f_unaccent(lower(title)), f_unaccent(lower(:title))) AS score
+                    FROM questions
+                    WHERE f_unaccent(lower(title)) % f_unaccent(lower(:title))
+                      AND status IN ('open', 'queued', 'checked')
+                    ORDER BY score DESC
+                    LIMIT 1
+                    """
+                ),
+                {"title": title},
+            ).first()
+            matches = [(row.id, float(row.score))] if row and row.score >= threshold else []
+        else:
+            matches = self._local_index(db).query(title, threshold)
+
+        for qid, score in matches:
+            q = db.get(models.Question, qid)
+            if q and q.status in MATCHABLE_STATUSES:
+                return q, score
+        return None
+
+    def register(self, question: models.Question):
+        """Make a freshly inserted question matchable by the in-process index"""
+        if self._index is not None:
+            self._index.add(question.id, question.title)
+
+
+question_deduper = QuestionDeduper()
@@ -0,0 +1,92 @@
+"""Keeps analytics ingestion alive across Redis outages.
+
+`Backoff` spaces out reconnect attempts after a failure (exponential, capped),
+so a dead Redis costs one fast check per event instead of a connect timeout.
+`EventBuffer` is a bounded in-process ring of events that could not be
+published; the next successful publish sends them in the same pipeline.
+Both are per process. Their counters size EVENT_BUFFER_SIZE.
+"""
+import threading
+import time
+from collections import deque
+from typing import Iterable, List
+
+
+class Backoff:
+    def __init__(self, initial: float = 0.5, maximum: float = 30.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+    def ready(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = str(error)[:200]
+        delay = min(self.maximum, self.initial * 2 ** (self.failures - 1))
+        self.retry_at = time.monotonic() + delay
+
+    def success(self):
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.failures == 0,
+            "consecutive_failures": self.failures,
+            "retry_in_s": round(max(0.0, self.retry_at - time.monotonic()), 2),
+            "last_error": self.last_error,
+        }
+
+
+class EventBuffer:
+    """Oldest events are evicted (and counted as dropped) once the ring is full"""
+
+    def __init__(self, size: int):
+        self._events = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.buffered = 0  # events that went through the buffer
+        self.dropped = 0  # evicted before Redis came back
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def extend(self, events: Iterable) -> int:
+        """Returns how many older events were evicted to make room"""
+        dropped = 0
+        with self._lock:
+            for event in events:
+                if len(self._events) == self._events.maxlen:
+                    dropped += 1
+                self._events.append(event)
+                self.buffered += 1
+            self.dropped += dropped
+        return dropped
+
+    def requeue(self, events: List) -> int:
+        """Put back events from a failed flush ahead of newer ones; returns how many didn't fit"""
+        with self._lock:
+            room = self._events.maxlen - len(self._events)
+            keep = events[-room:] if room > 0 else []
+            self.dropped += len(events) - len(keep)
+            self._events.extendleft(reversed(keep))
+        return len(events) - len(keep)
+
+    def drain(self) -> List:
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._events),
+            "capacity": self._events.maxlen,
+            "buffered_total": self.buffered,
+            "flushed_total": self.flushed,
+            "dropped_total": self.dropped,
+        }
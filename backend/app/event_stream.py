@@ -0,0 +1,247 @@
+"""Analytics events through a Redis Stream.
+
+The API only XADDs each event to the capped stream `events:stream`.
+`python -m app.worker events` runs consumers in the `aggregators` group:
+each reads a batch, applies every write (HLLs, hot score, trending, user
+sketches) in one pipeline and XACKs only after that pipeline succeeded,
+so processing is at-least-once. Entries left pending by a dead consumer
+are reclaimed with XAUTOCLAIM. More consumers = more throughput.
+
+Events carrying a client `event_id` are published through a Lua script
+that first checks a time-bucketed Bloom filter: a retry seen in the
+current or previous bucket is dropped before it reaches the stream, so
+no counter is ever touched twice. Memory is fixed by the configured
+capacity and false-positive rate.
+"""
+import hashlib
+import logging
+import math
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from app import analytics_history, hot_scores, trending
+from app.redis_client import queue_script
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "events:stream"
+GROUP = "aggregators"
+EVENT_FIELDS = ("type", "uid", "ts", "fact_check_id", "query", "question", "category")
+USER_TTL = 60 * 60 * 24 * 365
+DEDUPE_PREFIX = "events:dedupe"
+DUPLICATES_KEY = "events:dedupe:dropped"
+
+# KEYS: current bucket filter, previous bucket filter, stream, duplicate counter
+# ARGV: maxlen, k, k bit positions, filter ttl, then field/value pairs
+_PUBLISH_ONCE_SCRIPT = """
+local k = tonumber(ARGV[2])
+local seen_now, seen_before = 1, 1
+for i = 3, k + 2 do
+    if seen_now == 1 and redis.call('GETBIT', KEYS[1], ARGV[i]) == 0 then seen_now = 0 end
+    if seen_before == 1 and redis.call('GETBIT', KEYS[2], ARGV[i]) == 0 then seen_before = 0 end
+end
+if seen_now == 1 or seen_before == 1 then
+    redis.call('INCR', KEYS[4])
+    return 0
+end
+for i = 3, k + 2 do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[k + 3])
+local fields = {}
+for i = k + 4, #ARGV do
+    fields[#fields + 1] = ARGV[i]
+end
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[1], '*', unpack(fields))
+return 1
+"""
+
+
+def stream_fields(event) -> Dict[str, str]:
+    """Flatten a validated Event into stream fields (None values are dropped)"""
+    ts = event.ts or datetime.now(timezone.utc)
+    fields = {"type": event.type, "uid": event.uid, "ts": str(int(ts.timestamp()))}
+    for name in ("fact_check_id", "query", "question", "category"):
+        value = getattr(event, name)
+        if value:
+            fields[name] = value
+    return fields
+
+
+def bloom_params(capacity: int, fp_rate: float):
+    """Optimal (bits, hash count) for `capacity` items at `fp_rate`"""
+    bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def bloom_positions(item: str, bits: int, hashes: int):
+    """Kirsch-Mitzenmacher double hashing: h1 + i*h2"""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "big")
+    h2 = int.from_bytes(digest[8:], "big") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class EventPublisher:
+    """Queues events on a (sync or async) pipeline; registers the dedupe script once per client"""
+
+    def __init__(self, r):
+        self.r = r
+        self._publish_once = r.register_script(_PUBLISH_ONCE_SCRIPT)
+        self.bits, self.hashes = bloom_params(settings.EVENT_DEDUPE_CAPACITY, settings.EVENT_DEDUPE_FP_RATE)
+
+    def queue(self, pipe, event):
+        """One XADD, or the check-and-XADD script when the client sent an event id"""
+        fields = stream_fields(event)
+        if not event.event_id or not settings.EVENT_DEDUPE_ENABLED:
+            pipe.xadd(STREAM_KEY, fields, maxlen=settings.EVENTS_STREAM_MAXLEN, approximate=True)
+            return
+        window = settings.EVENT_DEDUPE_WINDOW_SECONDS
+        bucket = int(time.time()) // window
+        positions = bloom_positions(f"{event.uid}:{event.event_id}", self.bits, self.hashes)
+        queue_script(
+            pipe,
+            self._publish_once,
+            keys=[f"{DEDUPE_PREFIX}:{bucket}", f"{DEDUPE_PREFIX}:{bucket - 1}", STREAM_KEY, DUPLICATES_KEY],
+            args=[
+                settings.EVENTS_STREAM_MAXLEN, len(positions), *positions, window * 2 + 60,
+                *[part for pair in fields.items() for part in pair],
+            ],
+        )
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def ensure_group(r):
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+class EventAggregator:
+    """Applies stream entries to the analytics keys; scripts are registered once per client"""
+
+    def __init__(self, r):
+        self.r = r
+        self.hot_scorer = hot_scores.HotScorer(r)
+        self.trending = trending.TrendingSearches(r)
+
+    def queue(self, pipe, fields: Dict[str, str]):
+        event_type = fields.get("type")
+        uid = fields.get("uid", "")
+        ts = int(fields.get("ts") or time.time())
+        hour_key = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m%d%H")
+        fc_id = fields.get("fact_check_id")
+
+        if event_type in hot_scores.EVENT_WEIGHTS and fc_id:
+            # HyperLogLog bucket per hour; the hourly rollup folds it into a daily sketch
+            hll_key = f"fc:{fc_id}:hll:{hour_key}"
+            self.hot_scorer.bump(pipe, event_type, fc_id, uid, hll_key, ts)
+            pipe.expire(hll_key, 60 * 60 * (settings.HLL_HOURLY_KEEP_HOURS + 24))
+            if event_type == "open":
+                pipe.pfadd(f"user_stories_read:{uid}", fc_id)
+                pipe.expire(f"user_stories_read:{uid}", USER_TTL)
+            elif event_type == "share":
+                pipe.pfadd(f"user_stories_shared:{uid}", fc_id)
+                pipe.expire(f"user_stories_shared:{uid}", USER_TTL)
+            # Raw per-hour counters for the Postgres rollup
+            counts_key = analytics_history.counts_key(hour_key)
+            pipe.hincrby(counts_key, f"{event_type}:{fc_id}", 1)
+            pipe.expire(counts_key, analytics_history.COUNTS_TTL)
+            # Touch candidate set so a rebuild knows what to rescore; engagement weighs more
+            pipe.zincrby(hot_scores.CANDIDATES_KEY, 1 if event_type == "open" else 3, fc_id)
+
+        elif event_type == "search" and fields.get("query"):
+            self.trending.record(pipe, fields["query"], hour_key)
+
+        elif event_type == "question" and fields.get("question"):
+            pipe.pfadd(f"user_questions:{uid}", fields["question"].lower())
+            pipe.expire(f"user_questions:{uid}", USER_TTL)
+
+    def apply(self, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        """Aggregate a batch in one pipeline, then XACK it. Returns entries processed."""
+        if not entries:
+            return 0
+        pipe = self.r.pipeline(transaction=False)
+        for _, fields in entries:
+            self.queue(pipe, fields)
+        pipe.execute()
+        # Ack only after the writes landed: a crash before this redelivers the batch
+        self.r.xack(STREAM_KEY, GROUP, *[entry_id for entry_id, _ in entries])
+        return len(entries)
+
+
+class StreamConsumer:
+    def __init__(self, r, name: Optional[str] = None, batch_size: int = settings.EVENTS_STREAM_BATCH):
+        self.r = r
+        self.name = name or consumer_name()
+        self.batch_size = batch_size
+        self.aggregator = EventAggregator(r)
+        self.processed = 0
+        self.reclaimed = 0
+        self._claim_cursor = "0-0"
+        ensure_group(r)
+
+    def read_batch(self, block_ms: int = 5000) -> int:
+        """Block for new entries and aggregate them"""
+        response = self.r.xreadgroup(GROUP, self.name, {STREAM_KEY: ">"}, count=self.batch_size, block=block_ms)
+        entries = response[0][1] if response else []
+        n = self.aggregator.apply(entries)
+        self.processed += n
+        return n
+
+    def reclaim(self) -> int:
+        """Take over entries another consumer read but never acked (crashed or stuck)"""
+        result = self.r.xautoclaim(
+            STREAM_KEY, GROUP, self.name,
+            min_idle_time=settings.EVENTS_STREAM_CLAIM_IDLE_MS,
+            start_id=self._claim_cursor, count=self.batch_size,
+        )
+        self._claim_cursor, entries = result[0], result[1]
+        # Trimmed entries come back as None payloads: ack them so they leave the PEL
+        live = [(entry_id, fields) for entry_id, fields in entries if fields]
+        dead = [entry_id for entry_id, fields in entries if not fields]
+        if dead:
+            self.r.xack(STREAM_KEY, GROUP, *dead)
+        n = self.aggregator.apply(live)
+        self.reclaimed += n
+        return n
+
+
+def stream_stats(r) -> dict:
+    """Length, consumer-group lag and pending entries for the metrics endpoint"""
+    stats = {
+        "stream": STREAM_KEY,
+        "group": GROUP,
+        "length": r.xlen(STREAM_KEY),
+        "duplicates_dropped": int(r.get(DUPLICATES_KEY) or 0),
+    }
+    try:
+        groups = {g["name"]: g for g in r.xinfo_groups(STREAM_KEY)}
+    except ResponseError:
+        return {**stats, "error": "stream or group does not exist yet"}
+    group = groups.get(GROUP) or groups.get(GROUP.encode())
+    if not group:
+        return {**stats, "error": "consumer group does not exist yet"}
+    consumers = r.xinfo_consumers(STREAM_KEY, GROUP)
+    stats.update({
+        "pending": group.get("pending"),
+        "lag": group.get("lag"),  # Redis >= 7; entries not yet delivered to the group
+        "last_delivered_id": group.get("last-delivered-id"),
+        "consumers": [
+            {"name": c.get("name"), "pending": c.get("pending"), "idle_ms": c.get("idle")}
+            for c in consumers
+        ],
+    })
+    return stats
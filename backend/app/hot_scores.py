@@ -0,0 +1,429 @@
+"""Hot ranking for fact-checks.
+
+`hot:24h` holds an exponentially time-decayed engagement score kept in
+log space: for events with weight w_i at time t_i the stored value is
+
+    S = ln( sum_i w_i * exp((t_i - EPOCH) / TAU) ) + age_offset
+
+Decay multiplies every member by the same factor, so the order of the
+stored values is the current ranking and no rescoring is ever needed.
+`ingest_event` folds each event in with one Lua call (log-add-exp), the
+periodic job only trims members that decayed away, and `rebuild_hot_scores`
+reconstructs the set from the hourly HyperLogLogs when it is lost.
+
+The periodic job runs under a Redis lease so only one process does it per
+interval. A rebuild can be split into HOT_RECOMPUTE_SHARDS hash shards of
+the candidate set: helpers claim shards, store partial rankings and the
+caller merges them with one ZUNIONSTORE.
+"""
+import json
+import logging
+import math
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from app.leases import Lease
+from app.redis_client import queue_script
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HOT_KEY = "hot:24h"
+CANDIDATES_KEY = "hot:candidates"
+CREATED_AT_KEY = "fc:created_at"  # hash: fact-check id -> created_at (unix ts)
+PAYLOAD_KEY = "hot:24h:payload"  # serialized, hydrated ranking served by GET /fact-checks/hot
+DEFAULT_AGE_HOURS = 12.0
+CHUNK_SIZE = 1000
+RECOMPUTE_LEASE = "hot:recompute"
+REBUILD_PREFIX = "hot:rebuild"
+SHARD_CLAIM_TTL = 60  # seconds; a shard whose claimer died is retaken after this
+REBUILD_STATE_TTL = 600
+REBUILD_WAIT_SECONDS = 300
+
+EPOCH = 1_700_000_000  # fixed origin for the log-space scores
+AGE_TAU_SECONDS = 24 * 3600  # older fact-checks rank lower: exp(-age_h / 24)
+EVENT_WEIGHTS = {"open": 1.0, "read_complete": 3.0, "share": 3.0}
+
+# KEYS: hourly HLL, hot zset, created_at hash
+# ARGV: uid, fact-check id, log term of this event (without age offset),
+#       only count new uniques (1/0), event ts, EPOCH, AGE_TAU_SECONDS, default age (s)
+_BUMP_SCRIPT = """
+local added = redis.call('PFADD', KEYS[1], ARGV[1])
+if ARGV[4] == '1' and added == 0 then
+    return 0
+end
+local created = tonumber(redis.call('HGET', KEYS[3], ARGV[2]) or (tonumber(ARGV[5]) - tonumber(ARGV[8])))
+local x = tonumber(ARGV[3]) + (created - tonumber(ARGV[6])) / tonumber(ARGV[7])
+local cur = redis.call('ZSCORE', KEYS[2], ARGV[2])
+if cur then
+    cur = tonumber(cur)
+    local hi = math.max(cur, x)
+    local lo = math.min(cur, x)
+    x = hi + math.log(1 + math.exp(lo - hi))
+end
+redis.call('ZADD', KEYS[2], x, ARGV[2])
+return 1
+"""
+
+
+def tau_seconds() -> float:
+    return settings.HOT_DECAY_TAU_HOURS * 3600.0
+
+
+def hour_keys(fact_check_id: str, hours: int, now: datetime) -> List[str]:
+    return [
+        f"fc:{fact_check_id}:hll:{(now - timedelta(hours=i)).strftime('%Y%m%d%H')}"
+        for i in range(hours)
+    ]
+
+
+def _as_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def remember_created_at(r, created: Dict[str, datetime]):
+    """Write-through when checks are created, so scoring never has to ask the DB"""
+    if not created:
+        return
+    try:
+        r.hset(CREATED_AT_KEY, mapping={fc_id: _epoch(dt) for fc_id, dt in created.items()})
+    except Exception as e:
+        logger.warning(f"Could not cache created_at: {e}")
+
+
+def _epoch(dt: datetime) -> float:
+    # Check.created_at is naive UTC
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _load_created_at_from_db(fact_check_ids: List[str]) -> Dict[str, datetime]:
+    from app.db import SessionLocal
+    from app import models
+
+    db = SessionLocal()
+    try:
+        found = {}
+        # Chunked only to keep the bind-parameter count sane on very large misses
+        for start in range(0, len(fact_check_ids), 5000):
+            chunk = fact_check_ids[start:start + 5000]
+            rows = db.query(models.Check.id, models.Check.created_at).filter(models.Check.id.in_(chunk)).all()
+            found.update({fc_id: created for fc_id, created in rows if created})
+        return found
+    finally:
+        db.close()
+
+
+def created_at_lookup(r, fact_check_ids: List[str]) -> Dict[str, float]:
+    """created_at (unix ts) per id: one HMGET, plus one IN query for cache misses"""
+    if not fact_check_ids:
+        return {}
+    cached = r.hmget(CREATED_AT_KEY, fact_check_ids)
+    found = {fc_id: float(ts) for fc_id, ts in zip(fact_check_ids, cached) if ts is not None}
+    missing = [fc_id for fc_id in fact_check_ids if fc_id not in found]
+    if missing:
+        try:
+            from_db = _load_created_at_from_db(missing)
+        except Exception as e:
+            logger.warning(f"created_at lookup failed: {e}")
+            from_db = {}
+        remember_created_at(r, from_db)
+        found.update({fc_id: _epoch(dt) for fc_id, dt in from_db.items()})
+    return found
+
+
+def fact_check_ages(r, fact_check_ids: List[str], now: datetime) -> Dict[str, float]:
+    """Age in hours per fact-check; unknown ids get DEFAULT_AGE_HOURS"""
+    created = created_at_lookup(r, fact_check_ids)
+    now_ts = now.timestamp()
+    return {
+        fc_id: max(0.0, (now_ts - created[fc_id]) / 3600.0) if fc_id in created else DEFAULT_AGE_HOURS
+        for fc_id in fact_check_ids
+    }
+
+
+def age_offset(age_hours: float, now: datetime) -> float:
+    """Constant per-fact-check log offset equivalent to multiplying by exp(-age / 24h)"""
+    created_ts = now.timestamp() - age_hours * 3600.0
+    return (created_ts - EPOCH) / AGE_TAU_SECONDS
+
+
+def log_term(weight: float, ts: float, offset: float = 0.0) -> float:
+    return math.log(weight) + (ts - EPOCH) / tau_seconds() + offset
+
+
+def decayed_value(log_score: float, now: datetime) -> float:
+    """Human-readable score at `now` (relative to the age offset baseline)"""
+    return math.exp(log_score - (now.timestamp() - EPOCH) / tau_seconds()
+                    - age_offset(0.0, now))
+
+
+class HotScorer:
+    """Registers the bump script once per Redis client (sync or asyncio)"""
+
+    def __init__(self, r):
+        self.r = r
+        self._bump = r.register_script(_BUMP_SCRIPT)
+
+    def bump(self, pipe, event_type: str, fact_check_id: str, uid: str, hll_key: str, ts: float):
+        """Queue the O(1) decayed-score update for one event on `pipe`"""
+        # The age offset is resolved inside the script from fc:created_at (no extra round trip)
+        term = log_term(EVENT_WEIGHTS[event_type], ts)
+        # Opens only count once per reader per hour; engagement events always count
+        only_new = "1" if event_type == "open" else "0"
+        queue_script(
+            pipe,
+            self._bump,
+            keys=[hll_key, HOT_KEY, CREATED_AT_KEY],
+            args=[uid, fact_check_id, repr(term), only_new, ts, EPOCH, AGE_TAU_SECONDS, DEFAULT_AGE_HOURS * 3600],
+        )
+
+
+def trim_hot(r, now: Optional[datetime] = None) -> int:
+    """Drop members whose decayed score fell below HOT_MIN_SCORE and cap the set size"""
+    now = now or datetime.now(timezone.utc)
+    cutoff = math.log(settings.HOT_MIN_SCORE) + (now.timestamp() - EPOCH) / tau_seconds() + age_offset(0.0, now)
+    pipe = r.pipeline(transaction=False)
+    pipe.zremrangebyscore(HOT_KEY, "-inf", f"({cutoff!r}")
+    pipe.zremrangebyrank(HOT_KEY, 0, -(settings.HOT_MAX_ENTRIES + 1))
+    removed = pipe.execute()
+    return int(removed[0]) + int(removed[1])
+
+
+def count_hourly_uniques(r, fact_check_ids: List[str], now: datetime, hours: int = 24) -> Dict[str, List[int]]:
+    """Unique readers per hour bucket (newest first), one pipeline round trip per chunk"""
+    pipe = r.pipeline(transaction=False)
+    for fc_id in fact_check_ids:
+        for key in hour_keys(fc_id, hours, now):
+            pipe.pfcount(key)
+    counts = pipe.execute()
+    return {
+        fc_id: [int(c) for c in counts[i * hours:(i + 1) * hours]]
+        for i, fc_id in enumerate(fact_check_ids)
+    }
+
+
+def shard_of(fact_check_id: str, shards: int) -> int:
+    return zlib.crc32(fact_check_id.encode("utf-8")) % shards
+
+
+def compute_scores(
+    r,
+    now: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+    shard: Optional[int] = None,
+    shards: int = 1,
+) -> Dict[str, float]:
+    """Log-space scores rebuilt from the hourly sketches (opens only; finer events are not stored)"""
+    now = now or datetime.now(timezone.utc)
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    candidates = [_as_str(c) for c in r.zrange(CANDIDATES_KEY, 0, -1)]
+    if shard is not None and shards > 1:
+        candidates = [c for c in candidates if shard_of(c, shards) == shard]
+    ages = fact_check_ages(r, candidates, now)  # one HMGET for every candidate
+    scores: Dict[str, float] = {}
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        uniques = count_hourly_uniques(r, chunk, now)
+        for fc_id in chunk:
+            terms = [
+                log_term(EVENT_WEIGHTS["open"] * n, (hour_start - timedelta(hours=i)).timestamp())
+                for i, n in enumerate(uniques[fc_id]) if n
+            ]
+            if not terms:
+                continue
+            hi = max(terms)
+            scores[fc_id] = hi + math.log(sum(math.exp(t - hi) for t in terms)) + age_offset(ages[fc_id], now)
+    return scores
+
+
+def write_hot(r, scores: Dict[str, float]):
+    """Replace hot:24h atomically so readers never see a half-written ranking"""
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(HOT_KEY)
+    if scores:
+        pipe.zadd(HOT_KEY, scores)
+    pipe.execute()
+
+
+def top_scores(r, now: Optional[datetime] = None, limit: int = 5) -> Dict[str, float]:
+    now = now or datetime.now(timezone.utc)
+    return {
+        _as_str(fc_id): round(decayed_value(score, now), 4)
+        for fc_id, score in r.zrevrange(HOT_KEY, 0, limit - 1, withscores=True)
+    }
+
+
+def recompute_lease(r) -> Lease:
+    """Held for one interval by whoever trims/rebuilds, so replicas and POST /compute-hot skip it"""
+    return Lease(r, RECOMPUTE_LEASE, settings.HOT_RECOMPUTE_INTERVAL)
+
+
+def _rebuild_key(gen: str, suffix: str) -> str:
+    return f"{REBUILD_PREFIX}:{gen}:{suffix}"
+
+
+def score_shards(r, gen: str, shards: int, now_ts: float) -> int:
+    """Claim unscored shards of rebuild `gen` one by one and store their partial rankings"""
+    now = datetime.fromtimestamp(now_ts, tz=timezone.utc)
+    done_key = _rebuild_key(gen, "done")
+    offset = random.randrange(shards)  # helpers start on different shards
+    scored = 0
+    for i in range(shards):
+        shard = (offset + i) % shards
+        if r.sismember(done_key, shard):
+            continue
+        if not Lease(r, _rebuild_key(gen, f"claim:{shard}"), SHARD_CLAIM_TTL).acquire():
+            continue
+        scores = compute_scores(r, now, shard=shard, shards=shards)
+        key = _rebuild_key(gen, f"scores:{shard}")
+        pipe = r.pipeline(transaction=True)
+        pipe.delete(key)
+        if scores:
+            pipe.zadd(key, scores)
+        pipe.expire(key, REBUILD_STATE_TTL)
+        pipe.sadd(done_key, shard)
+        pipe.expire(done_key, REBUILD_STATE_TTL)
+        pipe.execute()
+        scored += 1
+    return scored
+
+
+def _sharded_rebuild(r, now: datetime, shards: int, fan_out: Optional[Callable]) -> int:
+    gen = uuid.uuid4().hex[:12]
+    if fan_out:
+        fan_out(gen, shards, now.timestamp())
+    done_key = _rebuild_key(gen, "done")
+    deadline = time.monotonic() + REBUILD_WAIT_SECONDS
+    # The caller scores whatever helpers haven't claimed, including shards whose claim expired
+    while True:
+        score_shards(r, gen, shards, now.timestamp())
+        if r.scard(done_key) >= shards:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Hot rebuild {gen}: only {r.scard(done_key)}/{shards} shards scored")
+        time.sleep(0.2)
+
+    keys = [_rebuild_key(gen, f"scores:{shard}") for shard in range(shards)]
+    pipe = r.pipeline(transaction=True)
+    pipe.zunionstore(HOT_KEY, keys)  # shards are disjoint; replaces hot:24h atomically
+    pipe.delete(*keys, done_key)
+    return int(pipe.execute()[0])
+
+
+def rebuild_hot_scores(
+    r,
+    now: Optional[datetime] = None,
+    chunk_size: int = CHUNK_SIZE,
+    shards: Optional[int] = None,
+    fan_out: Optional[Callable] = None,
+) -> dict:
+    """Full rebuild of hot:24h from sketches. Sync: call via asyncio.to_thread from async code.
+
+    With shards > 1, `fan_out(gen, shards, now_ts)` should start helpers running
+    `score_shards`; without helpers the caller scores every shard itself.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    shards = shards or settings.HOT_RECOMPUTE_SHARDS
+    if shards > 1:
+        computed = _sharded_rebuild(r, now, shards, fan_out)
+    else:
+        scores = compute_scores(r, now, chunk_size)
+        if scores:
+            write_hot(r, scores)
+        computed = len(scores)
+    return {
+        "computed": computed,
+        "shards": shards,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "top_scores": top_scores(r, now),
+    }
+
+
+def maintain_hot_scores(r, now: Optional[datetime] = None, fan_out: Optional[Callable] = None) -> dict:
+    """Periodic job: trim decayed members; rebuild only if the ranking was lost"""
+    started = time.perf_counter()
+    if not r.exists(HOT_KEY):
+        return rebuild_hot_scores(r, now, fan_out=fan_out)
+    removed = trim_hot(r, now)
+    return {
+        "trimmed": removed,
+        "size": r.zcard(HOT_KEY),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "top_scores": top_scores(r, now),
+    }
+
+
+def category_key(category: str) -> str:
+    return f"hot:24h:{category}"
+
+
+def _serialize_check(check, score: float) -> dict:
+    published = check.published_at or check.created_at
+    return {
+        "id": check.id,
+        "title": check.title,
+        "verdict": check.verdict,
+        "confidence": check.confidence,
+        "publishedAt": published.replace(tzinfo=timezone.utc).isoformat() if published else None,
+        "category": check.category,
+        "summary": check.summary,
+        "autoGenerated": bool(check.auto_generated),
+        "sources": check.sources or [],
+        "hotScore": round(score, 4),
+    }
+
+
+def build_hot_payload(r, now: Optional[datetime] = None) -> dict:
+    """Top-N hydrated with a single IN query, plus per-category slices"""
+    from app.db import SessionLocal
+    from app import models
+
+    now = now or datetime.now(timezone.utc)
+    size = settings.HOT_PAYLOAD_SIZE
+    # Read deeper than N so smaller categories still get a useful slice
+    ranked = [(_as_str(fc_id), s) for fc_id, s in r.zrevrange(HOT_KEY, 0, size * 4 - 1, withscores=True)]
+    by_id = {}
+    if ranked:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(models.Check)
+                .filter(models.Check.id.in_([fc_id for fc_id, _ in ranked]))
+                .filter(models.Check.status.in_(["draft", "published"]))
+                .all()
+            )
+            by_id = {row.id: row for row in rows}
+        finally:
+            db.close()
+
+    ordered = [_serialize_check(by_id[fc_id], decayed_value(s, now)) for fc_id, s in ranked if fc_id in by_id]
+    categories: Dict[str, List[dict]] = {}
+    for item in ordered:
+        slice_ = categories.setdefault(item["category"] or "other", [])
+        if len(slice_) < size:
+            slice_.append(item)
+    return {"generated_at": now.isoformat(), "items": ordered[:size], "categories": categories}
+
+
+def publish_hot_payload(r, now: Optional[datetime] = None) -> dict:
+    """Store the payload and category slices in one MULTI; stale category keys are removed"""
+    payload = build_hot_payload(r, now)
+    previous = r.get(PAYLOAD_KEY)
+    stale = set()
+    if previous:
+        stale = set(json.loads(previous).get("categories", {})) - set(payload["categories"])
+
+    ttl = settings.HOT_PAYLOAD_TTL
+    pipe = r.pipeline(transaction=True)
+    pipe.set(PAYLOAD_KEY, json.dumps(payload, ensure_ascii=False), ex=ttl)
+    for category, items in payload["categories"].items():
+        pipe.set(category_key(category), json.dumps(items, ensure_ascii=False), ex=ttl)
+    for category in stale:
+        pipe.delete(category_key(category))
+    pipe.execute()
+    return payload
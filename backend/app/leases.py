@@ -0,0 +1,49 @@
+"""Redis leases: a key with a random owner token and a TTL.
+
+Only the owner can extend or release a lease; if the owner dies the
+lease simply expires. Used to keep periodic jobs from running twice
+across replicas.
+"""
+import uuid
+from typing import Optional
+
+# Compare-and-delete / compare-and-extend so a lease taken over after expiry is never touched
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class Lease:
+    def __init__(self, r, name: str, ttl: float):
+        self.r = r
+        self.key = f"lease:{name}"
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    def acquire(self) -> bool:
+        self.held = bool(self.r.set(self.key, self.token, nx=True, px=int(self.ttl * 1000)))
+        return self.held
+
+    def extend(self, ttl: Optional[float] = None) -> bool:
+        ms = int((ttl or self.ttl) * 1000)
+        self.held = bool(self.r.eval(_EXTEND_SCRIPT, 1, self.key, self.token, ms))
+        return self.held
+
+    def release(self) -> bool:
+        released = bool(self.r.eval(_RELEASE_SCRIPT, 1, self.key, self.token))
+        self.held = False
+        return released
+
+    def owner(self) -> Optional[str]:
+        value = self.r.get(self.key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
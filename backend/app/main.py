@@ -1,12 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.settings import cors_origins_list
+from app.settings import cors_origins_list, settings
 from app.db import Base, engine
-from app.routers import questions, checks, admin, support, analytics
-from app import auth_admin, admin_factchecks
+from app.search import ensure_search_index
+from app.dedupe import ensure_similarity_index
+from app.routers import questions, checks, admin, support, analytics, internal
+from app import auth_admin, admin_factchecks, metrics, sql_profiler
 
 # Creează tabelele la pornire (MVP). Pentru producție -> Alembic.
 Base.metadata.create_all(bind=engine)
+ensure_search_index(engine)
+ensure_similarity_index(engine)
 
 app = FastAPI(title="Factual Clone API", version="0.1.0")
 
@@ -17,6 +21,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.PrometheusMiddleware)
+if settings.SQL_PROFILE_ENABLED:
+    sql_profiler.install(engine)
+    app.add_middleware(sql_profiler.SQLProfilerMiddleware)
 
 app.include_router(questions.router)
 app.include_router(checks.router)
@@ -25,6 +33,7 @@ app.include_router(support.router)
 app.include_router(analytics.router)
 app.include_router(auth_admin.router)
 app.include_router(admin_factchecks.router)
+app.include_router(internal.router)
 
 @app.get("/")
 def root():
@@ -33,3 +42,8 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "factcheck-api"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
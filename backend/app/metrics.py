@@ -0,0 +1,201 @@
+"""Prometheus metrics for the API and the workers.
+
+Hot paths only touch pre-created metric objects (an increment or a
+histogram observe each); everything that needs a Redis round trip, like
+queue depths, is read by a collector at scrape time.
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty
+directory (wiped before the server starts): every process writes its
+samples there and GET /metrics aggregates them, whichever worker serves
+the scrape. Without it the endpoint reports the serving process only.
+"""
+import contextvars
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+)
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+HTTP_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request", ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement latency", ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+REDIS_COMMANDS = Counter("redis_commands_total", "Redis commands sent (pipelined ones included)", ["command"])
+REDIS_ERRORS = Counter("redis_errors_total", "Redis round trips that raised", ["command"])
+REDIS_SECONDS = Histogram(
+    "redis_request_duration_seconds", "Redis round-trip latency (a pipeline is one round trip)", ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5),
+)
+GEMINI_SECONDS = Histogram(
+    "gemini_request_duration_seconds", "Gemini generate_content latency", ["model", "outcome"],
+    buckets=(0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120),
+)
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Gemini tokens used", ["model", "kind"])
+EVENTS_INGESTED = Counter(
+    "analytics_events_total", "Analytics events handled by the API", ["outcome"],
+)  # received = published + buffered; flushed = buffered ones published later; dropped = evicted from the buffer
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+class RequestStats:
+    """SQL counters of the request being served (shared with threadpool endpoints via contextvars)"""
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def observe_query(statement: str, seconds: float):
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_SECONDS.labels(operation if operation in _OPERATIONS else "OTHER").observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+def instrument_engine(engine):
+    """Time every statement the engine executes"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        observe_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+
+
+def observe_redis(command, seconds: float, commands: int = 1, error: bool = False):
+    name = command.upper() if isinstance(command, str) else command.decode().upper()
+    REDIS_COMMANDS.labels(name).inc(commands)
+    REDIS_SECONDS.labels(name).observe(seconds)
+    if error:
+        REDIS_ERRORS.labels(name).inc()
+
+
+def observe_gemini(model: str, seconds: float, outcome: str, response=None):
+    GEMINI_SECONDS.labels(model, outcome).observe(seconds)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                       ("thinking", "thoughts_token_count"), ("tool", "tool_use_prompt_token_count")):
+        count = getattr(usage, attr, None)
+        if count:
+            GEMINI_TOKENS.labels(model, kind).inc(count)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware: per-route latency and per-request SQL totals"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            # Route template, not the raw path, so ids don't explode the label set
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.labels(scope["method"], route, str(status[0])).observe(time.perf_counter() - started)
+            HTTP_DB_QUERIES.labels(route).observe(stats.queries)
+            HTTP_DB_SECONDS.labels(route).observe(stats.db_seconds)
+
+
+class BacklogCollector:
+    """Queue depths read from Redis at scrape time (one pipelined round trip)"""
+
+    def describe(self):
+        return []  # don't let register() run collect() for the metric names
+
+    def collect(self):
+        from app.event_stream import STREAM_KEY
+        from app.worker import build_queues, hot_queue
+
+        rq_depth = GaugeMetricFamily("rq_queue_depth", "Jobs waiting in an RQ queue", labels=["queue"])
+        stream_length = GaugeMetricFamily("analytics_stream_length", "Entries in the analytics event stream")
+        try:
+            from app.redis_client import get_redis
+            pipe = get_redis().pipeline(transaction=False)
+            queues = [*build_queues().values(), hot_queue()]
+            names = [queue.name for queue in queues]
+            for queue in queues:
+                pipe.llen(queue.key)
+            pipe.xlen(STREAM_KEY)
+            *depths, length = pipe.execute()
+        except Exception:
+            return
+        for name, depth in zip(names, depths):
+            rq_depth.add_metric([name], depth)
+        stream_length.add_metric([], length)
+        yield rq_depth
+        yield stream_length
+
+
+_registry: Optional[CollectorRegistry] = None
+
+
+def render() -> tuple:
+    """(body, content type) for GET /metrics"""
+    global _registry
+    if _registry is None:
+        if MULTIPROC_DIR:
+            from prometheus_client import multiprocess
+            _registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(_registry)
+        else:
+            _registry = REGISTRY
+        _registry.register(BacklogCollector())
+    return generate_latest(_registry), CONTENT_TYPE_LATEST
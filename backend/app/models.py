@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db import Base
@@ -37,3 +37,27 @@ class Vote(Base):
     question_id = Column(String, ForeignKey("questions.id"), nullable=False)
     device_id = Column(String(64), nullable=True)  # simplu pentru MVP
     created_at = Column(DateTime, default=datetime.utcnow)
+
+# Agregate orare scrise de job-ul de rollup (app/analytics_history.py)
+class FactCheckHourlyStats(Base):
+    __tablename__ = "fact_check_hourly_stats"
+    fact_check_id = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # UTC, începutul orei
+    uniques = Column(Integer, default=0)  # cititori unici în ora respectivă
+    opens = Column(Integer, default=0)
+    shares = Column(Integer, default=0)
+    read_completes = Column(Integer, default=0)
+
+    __table_args__ = (
+        # Range scans "top checks last 30/90 days" read only the index on Postgres
+        Index(
+            "ix_fact_check_hourly_stats_hour", "hour",
+            postgresql_include=["fact_check_id", "uniques", "opens", "shares", "read_completes"],
+        ),
+    )
+
+class SearchTermHourly(Base):
+    __tablename__ = "search_term_hourly"
+    hour = Column(DateTime, primary_key=True)
+    term = Column(String(100), primary_key=True)  # normalizat (fără diacritice)
+    count = Column(Integer, default=0)
@@ -0,0 +1,88 @@
+"""Sampling profiler for live processes.
+
+A background thread snapshots the stack of every other thread
+(`sys._current_frames`) every `interval` seconds and counts identical
+stacks. Nothing is traced between samples, so the cost is one stack walk
+per thread per sample. The output is the collapsed-stack format read by
+flamegraph.pl, speedscope and inferno: one `frame;frame;...;leaf count`
+line per distinct stack, root first, prefixed by the thread name.
+
+API workers expose it at GET /admin/profile. The worker processes
+(`python -m app.worker ...`) dump a profile to PROFILE_DUMP_DIR on SIGUSR1.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from app.settings import settings
+
+MAX_SECONDS = 60
+MAX_DEPTH = 128
+_busy = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _stack(frame) -> str:
+    frames = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        frames.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def sample(seconds: float, interval: float = 0.01) -> Counter:
+    """Collapsed stacks -> sample count over `seconds` (the sampling thread itself is skipped)"""
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                stacks[f"{names.get(ident, ident)};{_stack(frame)}"] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapse(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def profile(seconds: float, interval: float = 0.01) -> Optional[str]:
+    """Collapsed-stack profile of this process, or None if one is already running"""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        return collapse(sample(min(seconds, MAX_SECONDS), interval))
+    finally:
+        _busy.release()
+
+
+def _dump(seconds: float):
+    output = profile(seconds)
+    if output is None:
+        print("⚠️ Profiler already running, SIGUSR1 ignored")
+        return
+    os.makedirs(settings.PROFILE_DUMP_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DUMP_DIR, f"profile-{os.getpid()}-{int(time.time())}.collapsed")
+    with open(path, "w") as f:
+        f.write(output)
+    print(f"📈 Profile written to {path}")
+
+
+def install_signal_handler(signum: int = signal.SIGUSR1):
+    """`kill -USR1 <pid>` profiles the process for PROFILE_SIGNAL_SECONDS in a background thread"""
+
+    def _handler(signum, frame):
+        print(f"📈 Profiling pid {os.getpid()} for {settings.PROFILE_SIGNAL_SECONDS}s...")
+        threading.Thread(target=_dump, args=(settings.PROFILE_SIGNAL_SECONDS,), daemon=True).start()
+
+    signal.signal(signum, _handler)
@@ -0,0 +1,190 @@
+"""Per-route rate limits as FastAPI dependencies.
+
+Each policy is a GCRA (generic cell rate algorithm) limit: one Redis key
+per client holding the "theoretical arrival time", checked and advanced
+by one Lua script, so there is no INCR/EXPIRE race and the key lives only
+as long as the client has burst capacity in use. `limit` requests are
+allowed as a burst, then one every `period / limit` seconds.
+
+Clients are always keyed by IP; a policy may add a second, stricter
+limit per X-Device-Id on top. X-Forwarded-For is only believed when the connection comes from a
+trusted proxy (TRUSTED_PROXIES). If Redis is unreachable the same policy
+is enforced with an in-process token bucket, i.e. per worker process.
+
+    @router.post("/generate", dependencies=[Depends(RateLimit("generate", settings.RATE_LIMIT_GENERATE))])
+"""
+import ipaddress
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from redis.exceptions import RedisError
+
+from app.event_buffer import Backoff
+from app.redis_client import get_async_redis
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rl"
+LOCAL_MAX_CLIENTS = 10_000
+
+# KEYS: client key. ARGV: emission interval (ms), burst window (ms)
+# Returns {allowed, retry_after_ms, remaining}
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, allow_at - now, 0}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0, math.floor((now - allow_at) / interval)}
+"""
+
+_UNITS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$")
+
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """'10/hour' -> (10, 3600), '10/5min' -> (10, 300)"""
+    m = _RATE.match(value.lower())
+    if not m or m.group(3) not in _UNITS or int(m.group(1)) < 1:
+        raise ValueError(f"Invalid rate {value!r}; use e.g. 10/minute or 10/5min")
+    return int(m.group(1)), int(m.group(2) or 1) * _UNITS[m.group(3)]
+
+
+@lru_cache(maxsize=1)
+def _trusted_networks():
+    return [ipaddress.ip_network(n.strip(), strict=False) for n in settings.TRUSTED_PROXIES.split(",") if n.strip()]
+
+
+def _is_trusted(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in _trusted_networks())
+
+
+def client_ip(request: Request) -> str:
+    """Peer address, or the first untrusted hop of X-Forwarded-For when the peer is a trusted proxy"""
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted(host):
+        return host
+    forwarded = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    # Walk right to left: every hop we trust may have appended the one before it
+    for hop in reversed(forwarded):
+        if not _is_trusted(hop):
+            return hop
+    return forwarded[0] if forwarded else host
+
+
+class _LocalBuckets:
+    """Token buckets per client for when Redis is down; least recently seen clients are evicted"""
+
+    def __init__(self, max_clients: int = LOCAL_MAX_CLIENTS):
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_clients = max_clients
+
+    def take(self, key: str, limit: int, period: float) -> Tuple[bool, float, int]:
+        rate = limit / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(limit), now))
+            tokens = min(float(limit), tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after, int(tokens)
+
+
+_local = _LocalBuckets()
+_redis_backoff = Backoff(maximum=30.0)
+_scripts = {}
+
+
+def _gcra():
+    r = get_async_redis()
+    script = _scripts.get(id(r))
+    if script is None:
+        script = _scripts[id(r)] = r.register_script(_GCRA_SCRIPT)
+    return script
+
+
+class RateLimit:
+    """Dependency enforcing `rate` ("10/hour") per client IP on the routes that use it.
+
+    `device_rate` adds a second, independent limit per X-Device-Id. It only
+    ever tightens the IP limit: the header is client-controlled, so a
+    fresh id per request must not buy a fresh allowance.
+    """
+
+    def __init__(self, name: str, rate: str, device_rate: Optional[str] = None):
+        self.name = name
+        self.limit, self.period = parse_rate(rate)
+        self.device_limit, self.device_period = parse_rate(device_rate) if device_rate else (None, None)
+        self.rejected = 0
+
+    def ip_key(self, request: Request) -> str:
+        return f"{KEY_PREFIX}:{self.name}:ip:{client_ip(request)}"
+
+    def device_key(self, request: Request) -> Optional[str]:
+        device_id = request.headers.get("x-device-id") if self.device_limit else None
+        return f"{KEY_PREFIX}:{self.name}:d:{device_id[:64]}" if device_id else None
+
+    async def check(self, key: str, limit: int, period: float) -> Tuple[bool, float, int]:
+        """(allowed, retry_after_seconds, remaining)"""
+        if _redis_backoff.ready():
+            interval_ms = period * 1000 / limit
+            try:
+                allowed, retry_ms, remaining = await _gcra()(
+                    keys=[key], args=[interval_ms, interval_ms * limit]
+                )
+                _redis_backoff.success()
+                return bool(allowed), float(retry_ms) / 1000, int(remaining)
+            except (RedisError, OSError) as e:
+                if _redis_backoff.failures == 0:
+                    logger.warning(f"Rate limiting falls back to in-process buckets: {e}")
+                _redis_backoff.failure(e)
+        return _local.take(key, limit, period)
+
+    def _reject(self, retry_after: float):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+    async def __call__(self, request: Request, response: Response):
+        allowed, retry_after, remaining = await self.check(self.ip_key(request), self.limit, self.period)
+        if not allowed:
+            self._reject(retry_after)
+        limit = self.limit
+        device_key = self.device_key(request)
+        if device_key:
+            allowed, retry_after, device_remaining = await self.check(
+                device_key, self.device_limit, self.device_period
+            )
+            if not allowed:
+                self._reject(retry_after)
+            if device_remaining < remaining:
+                limit, remaining = self.device_limit, device_remaining
+        response.headers["X-RateLimit-Limit"] = str(limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
@@ -0,0 +1,163 @@
+"""Shared Redis connection pools for the API and the workers.
+
+Every Redis user in a process goes through `get_redis` / `get_async_redis`,
+which hand out clients backed by one sync and one asyncio pool per
+`decode_responses` flavour, all configured from Settings.REDIS_URL. Pools
+are rebuilt after a fork (RQ work-horses, preloaded app servers) so a
+child never shares sockets with its parent, and idle connections are
+PINGed before reuse (`health_check_interval`). That only holds for code
+that calls the getters when it needs a client: don't keep one in a
+module-level variable.
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+import redis.asyncio as aioredis
+from redis import ConnectionPool, Redis
+from redis.client import Pipeline
+
+from app import metrics
+from app.settings import settings
+
+_lock = threading.Lock()
+_pid = os.getpid()
+_sync_clients: Dict[bool, Redis] = {}
+_async_clients: Dict[bool, aioredis.Redis] = {}
+
+
+class _TimedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        commands, started, failed = len(self.command_stack), time.perf_counter(), True
+        try:
+            result = super().execute(raise_on_error)
+            failed = False
+            return result
+        finally:
+            metrics.observe_redis("PIPELINE", time.perf_counter() - started, commands, failed)
+
+
+class _TimedRedis(Redis):
+    """Counts and times every command and pipeline round trip for /metrics"""
+
+    def execute_command(self, *args, **options):
+        started, failed = time.perf_counter(), True
+        try:
+            result = super().execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            metrics.observe_redis(args[0], time.perf_counter() - started, error=failed)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class _TimedAsyncPipeline(aioredis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        commands, started, failed = len(self.command_stack), time.perf_counter(), True
+        try:
+            result = await super().execute(raise_on_error)
+            failed = False
+            return result
+        finally:
+            metrics.observe_redis("PIPELINE", time.perf_counter() - started, commands, failed)
+
+
+class _TimedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        started, failed = time.perf_counter(), True
+        try:
+            result = await super().execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            metrics.observe_redis(args[0], time.perf_counter() - started, error=failed)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return _TimedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _pool_kwargs(decode_responses: bool) -> dict:
+    return {
+        "decode_responses": decode_responses,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+        # No read timeout by default: RQ and stream consumers block for long reads
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_keepalive": True,
+    }
+
+
+def _check_fork():
+    global _pid
+    if os.getpid() != _pid:
+        # Inherited sockets belong to the parent; start over in the child
+        _sync_clients.clear()
+        _async_clients.clear()
+        _pid = os.getpid()
+
+
+def get_redis(decode_responses: bool = True) -> Redis:
+    """Process-wide sync client. Use decode_responses=False for RQ (it pickles bytes)."""
+    _check_fork()
+    client = _sync_clients.get(decode_responses)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(decode_responses)
+            if client is None:
+                pool = ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs(decode_responses))
+                client = _sync_clients[decode_responses] = _TimedRedis(connection_pool=pool)
+    return client
+
+
+def get_async_redis(decode_responses: bool = True) -> aioredis.Redis:
+    """Process-wide asyncio client; its connections belong to the loop that first uses them"""
+    _check_fork()
+    client = _async_clients.get(decode_responses)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(decode_responses)
+            if client is None:
+                pool = aioredis.ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs(decode_responses))
+                client = _async_clients[decode_responses] = _TimedAsyncRedis(connection_pool=pool)
+    return client
+
+
+def pool_stats() -> dict:
+    """Connections per pool in this process (created / idle / in use)"""
+    stats = {}
+    for kind, clients in (("sync", _sync_clients), ("async", _async_clients)):
+        for decode, client in clients.items():
+            pool = client.connection_pool
+            idle = len(pool._available_connections)
+            in_use = len(pool._in_use_connections)
+            stats[f"{kind}{'' if decode else ':bytes'}"] = {
+                "created": idle + in_use,
+                "idle": idle,
+                "in_use": in_use,
+                "max": pool.max_connections,
+            }
+    return stats
+
+
+def check_health() -> dict:
+    """PING through the shared sync pool"""
+    try:
+        get_redis().ping()
+        return {"status": "ok", "pools": pool_stats()}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+def queue_script(pipe, script, keys, args):
+    """Queue a registered Lua script on a sync or async pipeline.
+
+    `Script.__call__` is a coroutine for async clients; queueing EVALSHA directly
+    lets the same code fill both kinds of pipeline. The pipeline loads missing
+    scripts before it executes.
+    """
+    pipe.scripts.add(script)
+    pipe.evalsha(script.sha, len(keys), *keys, *args)
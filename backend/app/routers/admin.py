@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from app.db import get_db
-from app import models
+from app import models, profiler
+from app.auth_admin import admin_required
 from datetime import datetime, timedelta
+import asyncio
+import os
 import uuid
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -147,3 +151,18 @@ def seed_database(db: Session = Depends(get_db)):
         "total_questions": total_questions,
         "total_checks": total_checks
     }
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=profiler.MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    _=Depends(admin_required),
+):
+    """Sampling profile of the worker process serving this request, as collapsed stacks (flamegraph)"""
+    output = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    if output is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    return PlainTextResponse(
+        output,
+        headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.collapsed"'},
+    )
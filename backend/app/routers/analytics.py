@@ -1,231 +1,254 @@
 # backend/app/routers/analytics.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, constr, Field
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, conlist, constr, Field
 from datetime import datetime, timezone, timedelta
 from typing import Literal, Optional, List, Dict
-import math
-import redis
+import asyncio
 import json
-import os
 from ..db import get_db
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from redis.exceptions import RedisError
+from .. import analytics_history, analytics_rollup, event_buffer, event_stream, hot_scores, metrics, timeseries, trending
+from ..redis_client import get_async_redis, get_redis
+from ..auth_admin import admin_required
+from ..settings import settings
 
 router = APIRouter()
 
-# Redis connection
-redis_host = os.getenv("REDIS_HOST", "redis")  # Default to 'redis' for Docker
-redis_port = int(os.getenv("REDIS_PORT", "6379"))
+# Redis clients come from app.redis_client on every use, never bound at import:
+# a forked worker must not keep its parent's pool. Connections are opened on
+# demand, so an outage at startup no longer disables analytics for the process.
+# The ingest path and hot reads use the async client so they never block the loop.
+_publishers: Dict[int, event_stream.EventPublisher] = {}
 
-try:
-    r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
-    r.ping()  # Test connection
-    print(f"✅ Connected to Redis at {redis_host}:{redis_port}")
-except Exception as e:
-    print(f"❌ Redis connection failed: {e}")
-    r = None
+def _publisher() -> event_stream.EventPublisher:
+    ar = get_async_redis()
+    publisher = _publishers.get(id(ar))
+    if publisher is None:
+        publisher = _publishers[id(ar)] = event_stream.EventPublisher(ar)
+    return publisher
+
+# While Redis is down, events wait in a bounded ring and are published with the
+# first batch that gets through; reconnects are attempted with backoff.
+redis_backoff = event_buffer.Backoff(maximum=settings.EVENT_BUFFER_RETRY_MAX_SECONDS)
+pending_events = event_buffer.EventBuffer(settings.EVENT_BUFFER_SIZE)
+
+def remember_check_created(check):
+    """Cache created_at for hot scoring as soon as a check exists"""
+    if not check.created_at:
+        return
+    try:
+        hot_scores.remember_created_at(get_redis(), {check.id: check.created_at})
+    except RedisError as e:
+        print(f"Hot scores created_at cache error: {e}")
+
+async def publish_events(events) -> None:
+    """Publish events (plus any buffered backlog) in one pipeline, or buffer them"""
+    if not redis_backoff.ready():
+        _buffer(events)
+        return
+    backlog = pending_events.drain()
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        for event in backlog:
+            _publisher().queue(pipe, event)
+        for event in events:
+            _publisher().queue(pipe, event)
+        await pipe.execute()
+    except (RedisError, OSError) as e:
+        if redis_backoff.failures == 0:
+            print(f"❌ Analytics Redis unavailable, buffering events: {e}")
+        redis_backoff.failure(e)
+        metrics.EVENTS_INGESTED.labels("dropped").inc(pending_events.requeue(backlog))
+        _buffer(events)
+        return
+    if redis_backoff.failures:
+        print(f"✅ Analytics Redis back, flushed {len(backlog)} buffered events")
+    redis_backoff.success()
+    pending_events.flushed += len(backlog)
+    metrics.EVENTS_INGESTED.labels("published").inc(len(events))
+    if backlog:
+        metrics.EVENTS_INGESTED.labels("flushed").inc(len(backlog))
+
+def _buffer(events):
+    metrics.EVENTS_INGESTED.labels("buffered").inc(len(events))
+    metrics.EVENTS_INGESTED.labels("dropped").inc(pending_events.extend(events))
+
+def ingest_stats() -> Dict:
+    """Buffer and reconnect counters of this worker process"""
+    return {"buffer": pending_events.stats(), "redis": redis_backoff.stats()}
 
 class Event(BaseModel):
     type: Literal["open", "read_complete", "share", "search", "question"]
     fact_check_id: Optional[constr(strip_whitespace=True, min_length=1)] = None
     uid: constr(strip_whitespace=True, min_length=8)
+    event_id: Optional[constr(strip_whitespace=True, min_length=8, max_length=64)] = None  # client-generated, makes retries idempotent
     ts: Optional[datetime] = None
     query: Optional[str] = None  # For search events
     result_count: Optional[int] = None  # For search events
     question: Optional[str] = None  # For question events
     category: Optional[str] = None  # For question events
 
+MAX_BATCH_EVENTS = 500
+
+class EventBatch(BaseModel):
+    events: conlist(Event, min_length=1, max_length=MAX_BATCH_EVENTS)
+
 @router.post("/events", status_code=204)
 async def ingest_event(event: Event):
-    """Ingest user interaction events for analytics"""
-    if not r:
-        # Silently ignore if Redis not available
-        return
-    
+    """Ingest user interaction events for analytics (aggregated by `python -m app.worker events`)"""
     try:
-        ts = int((event.ts or datetime.now(timezone.utc)).timestamp())
-        hour_key = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m%d%H")
-        
-        pipe = r.pipeline()
-        
-        if event.type in ["open", "read_complete", "share"] and event.fact_check_id:
-            # HyperLogLog bucket per hour (kept 48h)
-            hll_key = f"fc:{event.fact_check_id}:hll:{hour_key}"
-            pipe.pfadd(hll_key, event.uid)
-            pipe.expire(hll_key, 60*60*48)  # 48 hour retention
-            
-            # Track user actions for profile analytics
-            if event.type == "open":
-                user_reads_key = f"user_stories_read:{event.uid}"
-                pipe.pfadd(user_reads_key, event.fact_check_id)
-                pipe.expire(user_reads_key, 60*60*24*365)  # 1 year retention
-            elif event.type == "share":
-                user_shares_key = f"user_stories_shared:{event.uid}"
-                pipe.pfadd(user_shares_key, event.fact_check_id)
-                pipe.expire(user_shares_key, 60*60*24*365)  # 1 year retention
-            
-            # Touch candidate set so the scorer knows what to recompute
-            pipe.zincrby("hot:candidates", 1, event.fact_check_id)
-            
-            # For engagement events, give higher weight
-            if event.type in ["read_complete", "share"]:
-                pipe.zincrby("hot:candidates", 2, event.fact_check_id)
-                
-        elif event.type == "search" and event.query:
-            # Track search queries for trending topics
-            search_key = f"search:{hour_key}"
-            pipe.hincrby(search_key, event.query.lower(), 1)
-            pipe.expire(search_key, 60*60*24)  # 24 hour retention
-            
-        elif event.type == "question" and event.question:
-            # Track user questions for profile analytics
-            user_questions_key = f"user_questions:{event.uid}"
-            pipe.pfadd(user_questions_key, event.question.lower())
-            pipe.expire(user_questions_key, 60*60*24*365)  # 1 year retention
-        
-        await pipe.execute()
-        
+        await publish_events([event])
     except Exception as e:
         print(f"Analytics error: {e}")
         # Don't raise - analytics failures shouldn't break user experience
 
-async def hll_unique_count(fact_check_id: str, hours: int, now: datetime) -> int:
-    """Get approximate unique users for a fact-check in the last N hours"""
-    if not r:
-        return 0
-        
-    keys = []
-    for i in range(hours):
-        hour_key = (now - timedelta(hours=i)).strftime("%Y%m%d%H")
-        keys.append(f"fc:{fact_check_id}:hll:{hour_key}")
-    
-    if not keys:
-        return 0
-        
-    # Use a temporary key for merging
-    import uuid
-    tmp_key = f"tmp:hll:{fact_check_id}:{hours}:{uuid.uuid4().hex[:8]}"
-    
-    try:
-        r.pfmerge(tmp_key, *keys)
-        count = r.pfcount(tmp_key)
-        r.delete(tmp_key)
-        return int(count)
-    except:
-        return 0
-
-async def get_fact_check_created_at(fact_check_id: str) -> datetime:
-    """Get the created timestamp for a fact-check"""
+@router.post("/events/batch", status_code=204)
+async def ingest_events_batch(batch: EventBatch):
+    """Ingest up to MAX_BATCH_EVENTS events in one Redis round trip"""
     try:
-        # Mock for now - in production, query your database
-        # For now, assume created 1-24 hours ago randomly based on ID hash
-        hash_val = hash(fact_check_id) % 24
-        return datetime.now(timezone.utc) - timedelta(hours=hash_val)
-    except:
-        return datetime.now(timezone.utc) - timedelta(hours=12)
-
-async def compute_hot_score(fact_check_id: str, now: datetime) -> float:
-    """Compute hot score for a fact-check using time decay and engagement"""
-    uni_2h = await hll_unique_count(fact_check_id, 2, now)
-    uni_24h = await hll_unique_count(fact_check_id, 24, now)
-    
-    created_at = await get_fact_check_created_at(fact_check_id)
-    age_hours = max(0.0, (now - created_at).total_seconds() / 3600.0)
-    
-    # Enhanced formula: more weight on recent activity, faster decay
-    score = (uni_2h * 5 + uni_24h * 2) * math.exp(-age_hours / 24.0)
-    return score
+        await publish_events(batch.events)
+    except Exception as e:
+        print(f"Analytics batch error ({len(batch.events)} events): {e}")
 
 @router.post("/compute-hot")
-async def recompute_hot_scores():
-    """Recompute hot scores for all candidate fact-checks"""
-    if not r:
+async def recompute_hot_scores(_=Depends(admin_required)):
+    """Trim hot:24h now, as the worker does; a full rebuild from sketches only if the key is missing (admin only)"""
+    r = get_redis()
+    lease = hot_scores.recompute_lease(r)
+    try:
+        acquired = lease.acquire()
+    except RedisError:
         return {"status": "Redis not available"}
-        
-    now = datetime.now(timezone.utc)
-    
+    if not acquired:
+        return {"status": "skipped", "message": "Hot scores were already recomputed this interval"}
+
     try:
-        # Get all candidates that have had recent activity
-        candidates = r.zrange("hot:candidates", 0, -1)
-        
-        scores = {}
-        for fact_check_id in candidates:
-            score = await compute_hot_score(fact_check_id, now)
-            scores[fact_check_id] = score
-        
-        # Update the hot ranking
-        if scores:
-            r.zadd("hot:24h", scores)
-            r.expire("hot:24h", 60*10)  # 10 minute expiry
-            
-        return {
-            "status": "success", 
-            "computed": len(scores),
-            "top_scores": dict(sorted(scores.items(), key=lambda x: x[1], reverse=True)[:5])
-        }
-        
+        from ..worker import fan_out_hot_shards
+        result = await asyncio.to_thread(hot_scores.maintain_hot_scores, r, fan_out=fan_out_hot_shards)
+        await asyncio.to_thread(hot_scores.publish_hot_payload, r)
+        return {"status": "success", **result}
+
     except Exception as e:
+        lease.release()
         return {"status": "error", "message": str(e)}
 
+@router.get("/admin/analytics/memory")
+async def analytics_memory_report(sample: int = 200, _=Depends(admin_required)):
+    """Redis key counts and estimated bytes per key family (admin only)"""
+    try:
+        return await asyncio.to_thread(analytics_rollup.memory_report, get_redis(), max(1, min(sample, 2000)))
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Redis not available")
+
+@router.post("/admin/analytics/rollup")
+async def run_analytics_rollup(_=Depends(admin_required)):
+    """Fold finished hourly reader sketches into daily ones now (admin only)"""
+    try:
+        return await asyncio.to_thread(analytics_rollup.rollup_hourly_sketches, get_redis())
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Redis not available")
+
+async def _hot_payload() -> Optional[Dict]:
+    """Precomputed payload in one GET; rebuilt here only if the worker hasn't refreshed it"""
+    raw = await get_async_redis().get(hot_scores.PAYLOAD_KEY)
+    if raw:
+        return json.loads(raw)
+    if not await get_async_redis().exists(hot_scores.HOT_KEY):
+        return None
+    return await asyncio.to_thread(hot_scores.publish_hot_payload, get_redis())
+
 @router.get("/fact-checks/hot")
-async def get_hot_fact_checks(limit: int = 10) -> List[Dict]:
-    """Get the hottest/trending fact-checks"""
-    if not r:
-        # Fallback to a simple query if Redis not available
-        return []
-    
+async def get_hot_fact_checks(limit: int = 10, category: Optional[str] = None) -> List[Dict]:
+    """Get the hottest/trending fact-checks (optionally a single category slice)"""
     try:
-        # Get hot fact-check IDs in order
-        hot_ids = r.zrevrange("hot:24h", 0, limit-1)
-        
-        if not hot_ids:
-            # If no hot data, return recent fact-checks as fallback
+        if category:
+            raw = await get_async_redis().get(hot_scores.category_key(category))
+            if raw is not None:
+                return json.loads(raw)[:limit]
+        payload = await _hot_payload()
+        if not payload:
             return []
-            
-        # Mock data for now - in production, fetch from your database
-        # preserving the hot order
-        mock_fact_checks = []
-        for i, fact_check_id in enumerate(hot_ids):
-            mock_fact_checks.append({
-                "id": fact_check_id,
-                "title": f"Hot Fact-Check #{i+1}: {fact_check_id}",
-                "verdict": "true" if i % 2 == 0 else "false",
-                "confidence": 85 + (i * 2),
-                "publishedAt": (datetime.now(timezone.utc) - timedelta(hours=i+1)).isoformat(),
-                "category": ["health", "politics_internal", "football", "environment"][i % 4],
-                "summary": f"This is a trending fact-check that users are actively engaging with.",
-                "autoGenerated": False,
-                "sources": [f"Source {i+1}", f"Source {i+2}"]
-            })
-            
-        return mock_fact_checks
+        if category:
+            return payload["categories"].get(category, [])[:limit]
+        return payload["items"][:limit]
         
     except Exception as e:
         print(f"Hot fact-checks error: {e}")
         return []
 
+@router.get("/fact-checks/hot/payload")
+async def get_hot_payload() -> Dict:
+    """Full hot payload: ordered items plus per-category slices, for client-side filtering"""
+    empty = {"generated_at": None, "items": [], "categories": {}}
+    try:
+        return await _hot_payload() or empty
+    except Exception as e:
+        print(f"Hot payload error: {e}")
+        return empty
+
+@router.get("/analytics/fact-checks/{fact_check_ids}/timeseries")
+async def get_fact_check_timeseries(fact_check_ids: str, window: str = "48h", step: str = "1h") -> Dict:
+    """Unique readers per bucket and cumulative; comma-separate ids to load a dashboard grid at once"""
+    ids = list(dict.fromkeys(i.strip() for i in fact_check_ids.split(",") if i.strip()))
+    if not ids or len(ids) > timeseries.MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {timeseries.MAX_IDS} ids")
+    try:
+        window_h, step_h = timeseries.parse_hours(window), timeseries.parse_hours(step)
+        if not 1 <= step_h <= window_h:
+            raise ValueError("step must be between 1h and the window")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await asyncio.to_thread(timeseries.fact_check_series, get_redis(), ids, window_h, step_h)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Redis not available")
+
+HistoryMetric = Literal["uniques", "opens", "shares", "read_completes"]
+
+@router.get("/analytics/history/top-fact-checks")
+def get_top_fact_checks_history(
+    metric: HistoryMetric = "uniques",
+    days: int = Query(30, ge=1, le=365),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+) -> List[Dict]:
+    """Top fact-checks over a time range, from the hourly Postgres rollups"""
+    return analytics_history.top_fact_checks(db, metric, days, start, end, limit)
+
+@router.get("/analytics/history/fact-checks/{fact_check_id}")
+def get_fact_check_history(
+    fact_check_id: str,
+    granularity: Literal["hour", "day"] = "day",
+    days: int = Query(30, ge=1, le=365),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+) -> List[Dict]:
+    """Engagement history of one fact-check, hourly or summed per day"""
+    return analytics_history.fact_check_history(db, fact_check_id, granularity, days, start, end)
+
+@router.get("/analytics/history/search-terms")
+def get_search_terms_history(
+    days: int = Query(30, ge=1, le=365),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+) -> List[Dict]:
+    """Most searched terms over a time range"""
+    return analytics_history.top_search_terms(db, days, start, end, limit)
+
 @router.get("/analytics/trending-searches")
-async def get_trending_searches(hours: int = 24) -> List[Dict[str, str|int]]:
+async def get_trending_searches(hours: int = 24, limit: int = 20) -> List[Dict[str, str|int]]:
     """Get trending search queries"""
-    if not r:
-        return []
-        
     try:
-        now = datetime.now(timezone.utc)
-        all_searches = {}
-        
-        # Aggregate searches from last N hours
-        for i in range(hours):
-            hour_key = (now - timedelta(hours=i)).strftime("%Y%m%d%H")
-            search_key = f"search:{hour_key}"
-            
-            searches = r.hgetall(search_key)
-            for query, count in searches.items():
-                all_searches[query] = all_searches.get(query, 0) + int(count)
-        
-        # Sort by popularity and return top results
-        trending = sorted(all_searches.items(), key=lambda x: x[1], reverse=True)[:20]
-        return [{"query": query, "count": count} for query, count in trending]
+        return await asyncio.to_thread(trending.trending, get_redis(), hours, max(1, min(limit, 100)))
         
     except Exception as e:
         print(f"Trending searches error: {e}")
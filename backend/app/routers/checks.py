@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models, schemas
 from app.services.gemini_service import gemini_service
+from app.search import search_checks
+from app.redis_client import get_redis
+from app.rate_limit import RateLimit
+from app.admission import AdmissionController
+from app.settings import settings
+from app.routers.analytics import remember_check_created
+from app.worker import build_queues, enqueue_build_check
 from typing import Optional
 from datetime import datetime
+import asyncio
+import time
 import uuid
 
 router = APIRouter(prefix="", tags=["checks"])
@@ -54,6 +65,40 @@ def get_fact_check_statistics(db: Session = Depends(get_db)):
         "manual": manual_count
     }
 
+@router.get("/fact-checks/search", response_model=schemas.CheckSearchPage)
+def search_fact_checks(
+    q: str = Query(..., min_length=2, max_length=200, description="Search text (diacritics optional)"),
+    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    category: Optional[str] = Query(None, description="Filter by single category"),
+    categories: Optional[str] = Query(None, description="Filter by multiple categories (comma-separated)")
+):
+    """Ranked full-text search over fact-check titles and summaries"""
+    category_list = None
+    if categories:
+        category_list = [cat.strip() for cat in categories.split(",") if cat.strip()]
+    elif category:
+        category_list = [category]
+
+    try:
+        hits, next_cursor = search_checks(db, q, categories=category_list, limit=limit, cursor=cursor)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Hydrate all hits with one IN query, keeping the ranked order
+    rows = db.query(models.Check).filter(models.Check.id.in_([h["id"] for h in hits])).all() if hits else []
+    by_id = {row.id: row for row in rows}
+    items = [
+        schemas.CheckSearchHit(
+            **schemas.CheckOut.model_validate(by_id[h["id"]]).model_dump(),
+            rank=h["rank"],
+            snippet=h["snippet"],
+        )
+        for h in hits if h["id"] in by_id
+    ]
+    return schemas.CheckSearchPage(items=items, next_cursor=next_cursor)
+
 @router.get("/checks/{check_id}", response_model=schemas.CheckOut)
 def get_check(check_id: str, db: Session = Depends(get_db)):
     c = db.query(models.Check).get(check_id)
@@ -76,12 +121,75 @@ def get_categories():
         {"id": "other", "label": "Altele", "icon": "📰"}
     ]
 
-@router.post("/generate", response_model=schemas.GenerateCheckResponse)
+generate_rate_limit = RateLimit(
+    "generate", settings.RATE_LIMIT_GENERATE, device_rate=settings.RATE_LIMIT_GENERATE_DEVICE or None
+)
+generate_admission = AdmissionController(
+    "generate", settings.GENERATE_MAX_IN_FLIGHT, settings.GENERATE_TARGET_LATENCY
+)
+
+async def admit_generate():
+    """Yields whether the request got a slot; the slot is released and timed when it ends"""
+    if not generate_admission.try_acquire():
+        yield False
+        return
+    started = time.perf_counter()
+    try:
+        yield True
+    finally:
+        generate_admission.release(time.perf_counter() - started)
+
+def defer_generate(request: schemas.GenerateCheckRequest, db: Session) -> JSONResponse:
+    """Overload path for clients that accept async: queue the question for the build-check workers.
+
+    Blocking (DB commit, RQ enqueue): call it through asyncio.to_thread.
+    """
+    try:
+        backlog = build_queues()["build_check"].count
+    except RedisError:
+        backlog = None
+    if backlog is None or backlog >= settings.GENERATE_ASYNC_MAX_QUEUED:
+        raise HTTPException(
+            status_code=503,
+            detail="Serviciul de generare este supraîncărcat, încearcă mai târziu",
+            headers={"Retry-After": str(generate_admission.retry_after())},
+        )
+    question = models.Question(
+        id=str(uuid.uuid4()),
+        title=request.question,
+        status="queued",
+        votes_count=0,
+        created_at=datetime.utcnow(),
+    )
+    db.add(question)
+    db.commit()
+    enqueue_build_check(question_id=question.id)
+    generate_admission.deferred += 1
+    # Checkul construit de worker rămâne draft până la publish, ca la întrebările votate
+    return JSONResponse(
+        status_code=202,
+        content={"status": "queued", "question_id": question.id},
+        headers={"Location": f"/questions/{question.id}"},
+    )
+
+@router.post("/generate", response_model=schemas.GenerateCheckResponse, dependencies=[Depends(generate_rate_limit)])
 async def generate_fact_check(
     request: schemas.GenerateCheckRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    admitted: bool = Depends(admit_generate),
+    prefer: Optional[str] = Header(default=None),
 ):
-    """Generate a new fact-check using AI"""
+    """Generate a new fact-check using AI (503 + Retry-After when overloaded, 202 with `Prefer: respond-async`)"""
+    if not admitted:
+        if prefer and "respond-async" in prefer.lower():
+            # Off the loop: this runs exactly when the loop must stay responsive
+            return await asyncio.to_thread(defer_generate, request, db)
+        raise HTTPException(
+            status_code=503,
+            detail="Serviciul de generare este supraîncărcat, încearcă mai târziu",
+            headers={"Retry-After": str(generate_admission.retry_after())},
+        )
+
     try:
         # Generate fact-check using Gemini AI
         ai_result = await gemini_service.generate_fact_check(request.question)
@@ -124,6 +232,7 @@ async def generate_fact_check(
         db.add(new_check)
         db.commit()
         db.refresh(new_check)
+        remember_check_created(new_check)
         
         return schemas.GenerateCheckResponse(
             id=new_check.id,
@@ -188,27 +297,12 @@ async def test_different_models(request: schemas.GenerateCheckRequest):
 def get_user_analytics(user_id: str, db: Session = Depends(get_db)):
     """Get analytics for a specific user"""
     try:
-        from redis import Redis
-        import os
-        
-        # Connect to Redis - use same config as analytics.py
-        redis_host = os.getenv("REDIS_HOST", "redis")  # Changed from localhost to redis
-        redis_port = int(os.getenv("REDIS_PORT", 6379))
-        redis_db = int(os.getenv("REDIS_DB", 0))
-        
-        r = Redis(host=redis_host, port=redis_port, db=redis_db)
-        
-        # Get unique stories viewed (using HyperLogLog)
-        stories_read_key = f"user_stories_read:{user_id}"
-        stories_read_count = r.pfcount(stories_read_key) or 0
-        
-        # Get unique stories shared
-        stories_shared_key = f"user_stories_shared:{user_id}" 
-        stories_shared_count = r.pfcount(stories_shared_key) or 0
-        
-        # Get questions submitted
-        questions_key = f"user_questions:{user_id}"
-        questions_count = r.pfcount(questions_key) or 0
+        # Shared pool; the three HyperLogLog counts come back in one round trip
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.pfcount(f"user_stories_read:{user_id}")  # unique stories viewed
+        pipe.pfcount(f"user_stories_shared:{user_id}")  # unique stories shared
+        pipe.pfcount(f"user_questions:{user_id}")  # questions submitted
+        stories_read_count, stories_shared_count, questions_count = (n or 0 for n in pipe.execute())
         
         return {
             "stories_read": stories_read_count,
@@ -267,6 +361,7 @@ async def create_fact_check(
         db.add(new_check)
         db.commit()
         db.refresh(new_check)
+        remember_check_created(new_check)
         
         return new_check
         
@@ -310,6 +405,7 @@ def create_fact_check(
         db.add(check)
         db.commit()
         db.refresh(check)
+        remember_check_created(check)
         
         return check
         
@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from app.db import engine, pool_stats
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+@router.get("/metrics/db-pool")
+def db_pool_metrics():
+    """Connection pool counters for the worker process that served this request"""
+    return pool_stats.snapshot(engine.pool)
+
+@router.get("/metrics/redis")
+def redis_metrics():
+    """PING plus connection counts of the shared Redis pools in this worker process"""
+    from app.redis_client import check_health
+    return check_health()
+
+@router.get("/metrics/events-stream")
+def events_stream_metrics():
+    """Analytics stream length, consumer-group lag and pending (unacked) entries"""
+    from app.event_stream import stream_stats
+    from app.redis_client import get_redis
+
+    try:
+        return stream_stats(get_redis())
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/metrics/events-buffer")
+def events_buffer_metrics():
+    """Events buffered / dropped while Redis was unreachable, and reconnect state, in this worker process"""
+    from app.routers.analytics import ingest_stats
+    return ingest_stats()
+
+@router.get("/metrics/admission")
+def admission_metrics():
+    """Admission limit, in-flight and shed counters of POST /generate in this worker process"""
+    from app.routers.checks import generate_admission, generate_rate_limit
+    return {**generate_admission.stats(), "rate_limited_total": generate_rate_limit.rejected}
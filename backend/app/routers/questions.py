@@ -1,20 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
 from datetime import datetime
+import logging
 import uuid
 from app.db import get_db
 from app import models, schemas
-from app.settings import settings
 from app.worker import enqueue_build_check
 from app.deps import device_id_header
+from app.dedupe import question_deduper, same_claim
+from app.votes import record_vote, record_vote_db
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
-@router.post("", response_model=schemas.QuestionOut, status_code=status.HTTP_201_CREATED)
-def create_question(payload: schemas.QuestionCreate, db: Session = Depends(get_db)):
+@router.post(
+    "",
+    response_model=schemas.QuestionOut,
+    status_code=status.HTTP_201_CREATED,
+    responses={409: {"description": "Similar question exists; resubmit with force=true to create anyway"}},
+)
+def create_question(payload: schemas.QuestionCreate, response: Response, db: Session = Depends(get_db)):
+    title = payload.title.strip()
+    match = None if payload.force else question_deduper.find_similar(db, title)
+    if match:
+        existing, score = match
+        out = schemas.QuestionOut.model_validate(existing).model_copy(
+            update={"duplicate": True, "similarity": round(score, 3)}
+        )
+        if same_claim(title, existing.title, score):
+            # Același claim → returnăm întrebarea existentă ca voturile să se adune într-un loc
+            response.status_code = status.HTTP_200_OK
+            return out
+        # Doar asemănătoare (alt an, negație, alt verb): utilizatorul decide
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "O întrebare asemănătoare există deja",
+                "duplicate_of": out.model_dump(mode="json"),
+            },
+        )
+
     q = models.Question(
         id=f"q_{uuid.uuid4().hex[:10]}",
-        title=payload.title.strip(),
+        title=title,
         body=(payload.body or '').strip() or None,
         status="open",
         votes_count=0,
@@ -22,6 +53,7 @@ def create_question(payload: schemas.QuestionCreate, db: Session = Depends(get_d
     )
     db.add(q)
     db.commit(); db.refresh(q)
+    question_deduper.register(q)
     return q
 
 @router.get("", response_model=list[schemas.QuestionOut])
@@ -41,15 +73,23 @@ def vote_question(
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    # MVP: nu validăm încă unicitatea pe device; incrementăm simplu
-    q.votes_count += 1
+    # Voturile se numără atomic în Redis și ajung în Postgres prin flush_votes
+    try:
+        result = record_vote(q, device_id)
+    except RedisError as e:
+        logger.warning(f"Vote buffer unavailable, writing to DB: {e}")
+        result = record_vote_db(db, q, device_id)
 
-    # Prag → pune job și marchează queued
-    if q.votes_count >= settings.VOTE_THRESHOLD and q.status == "open":
-        q.status = "queued"
-        db.commit()
-        enqueue_build_check(question_id=q.id)
-    else:
+    # Prag → pune job și marchează queued (UPDATE condiționat: o singură dată)
+    if result.threshold_reached and q.status == "open":
+        queued = db.execute(
+            update(models.Question)
+            .where(models.Question.id == q.id, models.Question.status == "open")
+            .values(status="queued")
+        ).rowcount
         db.commit()
+        if queued:
+            enqueue_build_check(question_id=q.id, votes_count=result.votes_count, created_at=q.created_at)
+        db.refresh(q)
 
-    return schemas.VoteOut(question_id=q.id, votes_count=q.votes_count, status=q.status)
+    return schemas.VoteOut(question_id=q.id, votes_count=result.votes_count, status=q.status)
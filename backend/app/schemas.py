@@ -5,6 +5,7 @@ from typing import Optional, List
 class QuestionCreate(BaseModel):
     title: str = Field(min_length=5, max_length=280)
     body: Optional[str] = None
+    force: bool = False  # create even if a similar question exists (after the user saw `duplicate_of`)
 
 class QuestionOut(BaseModel):
     id: str
@@ -13,6 +14,8 @@ class QuestionOut(BaseModel):
     status: str
     votes_count: int
     created_at: datetime
+    duplicate: bool = False  # True when the submission matched an existing question
+    similarity: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -53,6 +56,14 @@ class CheckOut(BaseModel):
     class Config:
         from_attributes = True
 
+class CheckSearchHit(CheckOut):
+    rank: float
+    snippet: Optional[str] = None
+
+class CheckSearchPage(BaseModel):
+    items: List[CheckSearchHit]
+    next_cursor: Optional[str] = None
+
 class GenerateCheckRequest(BaseModel):
     question: str = Field(min_length=10, max_length=500, description="The question/claim to fact-check")
     category: Optional[str] = Field(None, description="Optional category hint for the AI")
@@ -0,0 +1,186 @@
+"""Full-text search over fact-checks (title + summary).
+
+Postgres: weighted tsvector with a Romanian stemming config that folds
+diacritics through `unaccent`, backed by an expression GIN index.
+SQLite: FTS5 table kept in sync by triggers (diacritics folded by the
+unicode61 tokenizer, no stemming) so search can be exercised locally.
+"""
+import base64
+import json
+import logging
+from typing import Optional, List, Tuple
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TS_CONFIG = "ro_unaccent"
+SNIPPET_START = "<b>"
+SNIPPET_STOP = "</b>"
+SEARCHABLE_STATUSES = ("draft", "published")
+
+
+def _pg_document(prefix: str = "") -> str:
+    """Weighted document expression; must match the GIN index expression exactly"""
+    return (
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({prefix}title, '')), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({prefix}summary, '')), 'B')"
+    )
+
+
+_PG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TS_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {TS_CONFIG} (COPY = romanian);
+            ALTER TEXT SEARCH CONFIGURATION {TS_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, romanian_stem;
+        END IF;
+    END
+    $$
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_checks_fts ON checks USING GIN (({_pg_document()}))",
+]
+
+_SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS checks_fts USING fts5(
+        check_id UNINDEXED, title, summary,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checks_fts_ai AFTER INSERT ON checks BEGIN
+        INSERT INTO checks_fts(check_id, title, summary) VALUES (new.id, new.title, coalesce(new.summary, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checks_fts_au AFTER UPDATE OF title, summary ON checks BEGIN
+        DELETE FROM checks_fts WHERE check_id = old.id;
+        INSERT INTO checks_fts(check_id, title, summary) VALUES (new.id, new.title, coalesce(new.summary, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checks_fts_ad AFTER DELETE ON checks BEGIN
+        DELETE FROM checks_fts WHERE check_id = old.id;
+    END
+    """,
+    # Backfill rows created before the FTS table existed
+    """
+    INSERT INTO checks_fts(check_id, title, summary)
+    SELECT id, title, coalesce(summary, '') FROM checks
+    WHERE NOT EXISTS (SELECT 1 FROM checks_fts f WHERE f.check_id = checks.id)
+    """,
+]
+
+
+def ensure_search_index(engine: Engine):
+    """Create the dialect-specific full-text index (idempotent, called at startup)"""
+    if engine.dialect.name not in ("postgresql", "sqlite"):
+        logger.warning("Full-text search not supported on %s", engine.dialect.name)
+        return
+    statements = _PG_SETUP if engine.dialect.name == "postgresql" else _SQLITE_SETUP
+    try:
+        with engine.begin() as conn:
+            for stmt in statements:
+                conn.execute(text(stmt))
+    except Exception as e:
+        logger.warning(f"Could not set up full-text search index: {e}")
+
+
+def encode_cursor(rank: float, check_id: str) -> str:
+    raw = json.dumps({"r": rank, "id": check_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return float(data["r"]), str(data["id"])
+
+
+def _fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 prefix query, quoting every term"""
+    terms = [t.replace('"', '') for t in q.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+def search_checks(
+    db: Session,
+    q: str,
+    categories: Optional[List[str]] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Return (hits, next_cursor). Each hit has id, rank and snippet, best match first."""
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit + 1, "statuses": list(SEARCHABLE_STATUSES)}
+
+    filters = ["c.status IN :statuses"]
+    if categories:
+        filters.append("c.category IN :categories")
+        params["categories"] = categories
+
+    keyset = ""
+    if cursor:
+        params["after_rank"], params["after_id"] = decode_cursor(cursor)
+        keyset = "WHERE rank < :after_rank OR (rank = :after_rank AND id > :after_id)"
+
+    if dialect == "postgresql":
+        params["q"] = q
+        sql = f"""
+        WITH query AS (SELECT websearch_to_tsquery('{TS_CONFIG}', :q) AS tsq),
+        hits AS (
+            SELECT c.id AS id,
+                   -- float4 → float8: the cursor rank comes back as a Python float (float8),
+                   -- and an unwidened real never compares equal to it, skipping tied rows
+                   ts_rank_cd({_pg_document('c.')}, query.tsq)::float8 AS rank,
+                   c.title AS title, c.summary AS summary, query.tsq AS tsq
+            FROM checks c, query
+            WHERE ({_pg_document('c.')}) @@ query.tsq
+              AND {' AND '.join(filters)}
+        ),
+        page AS (
+            SELECT * FROM hits {keyset}
+            ORDER BY rank DESC, id ASC
+            LIMIT :limit
+        )
+        SELECT id, rank,
+               ts_headline('{TS_CONFIG}', coalesce(nullif(summary, ''), title), tsq,
+                           'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=30, MinWords=10') AS snippet
+        FROM page
+        ORDER BY rank DESC, id ASC
+        """
+    else:
+        fts_query = _fts5_query(q)
+        if not fts_query:
+            return [], None
+        params["q"] = fts_query
+        sql = f"""
+        WITH hits AS (
+            SELECT c.id AS id,
+                   -bm25(checks_fts, 0.0, 10.0, 4.0) AS rank,
+                   snippet(checks_fts, -1, '{SNIPPET_START}', '{SNIPPET_STOP}', '…', 16) AS snippet
+            FROM checks_fts
+            JOIN checks c ON c.id = checks_fts.check_id
+            WHERE checks_fts MATCH :q
+              AND {' AND '.join(filters)}
+        )
+        SELECT id, rank, snippet FROM hits {keyset}
+        ORDER BY rank DESC, id ASC
+        LIMIT :limit
+        """
+
+    stmt = text(sql).bindparams(bindparam("statuses", expanding=True))
+    if categories:
+        stmt = stmt.bindparams(bindparam("categories", expanding=True))
+
+    rows = db.execute(stmt, params).mappings().all()
+    hits = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and hits:
+        next_cursor = encode_cursor(hits[-1]["rank"], hits[-1]["id"])
+    return hits, next_cursor
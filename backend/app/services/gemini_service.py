@@ -1,9 +1,11 @@
 import json
 import asyncio
 import logging
+import time
 from typing import Dict, Any
 from google import genai
 from google.genai import types
+from app import metrics
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -66,14 +68,8 @@ Răspunde DOAR cu un JSON în această formă:
 """
 
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    self.client.models.generate_content,
-                    model="gemini-2.5-pro",
-                    contents=prompt,
-                    config=types.GenerateContentConfig()
-                ),
-                timeout=self.search_timeout
+            response = await self._generate_content(
+                "gemini-2.5-pro", prompt, types.GenerateContentConfig(), self.search_timeout
             )
             result_text = response.text.strip()
             
@@ -105,10 +101,12 @@ Răspunde DOAR cu un JSON în această formă:
                 "explanation": f"Eroare la categorizare automată: {str(e)}"
             }
 
-    async def generate_fact_check(self, claim: str) -> Dict[str, Any]:
+    async def generate_fact_check(self, claim: str, strict: bool = False) -> Dict[str, Any]:
         """
         Generate a complete fact-check using Google Search Grounding
         Returns: {"verdict": "true", "confidence": 85, "summary": "...", "category": "...", "sources": [...]}
+        With strict=True errors are raised instead of returning an "unclear" placeholder,
+        so background jobs can retry rather than persist the error text.
         """
         
         prompt = f"""
@@ -195,6 +193,8 @@ ATENȚIE: Summary-ul trebuie să fie un text COMPLET FLUID fără referințe num
             return result
             
         except asyncio.TimeoutError:
+            if strict:
+                raise
             print(f"Timeout error in Gemini fact-check generation after {self.request_timeout}s")
             return {
                 "verdict": "unclear",
@@ -206,6 +206,8 @@ ATENȚIE: Summary-ul trebuie să fie un text COMPLET FLUID fără referințe num
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Error in Gemini fact-check generation: {error_msg}")
+            if strict:
+                raise
             
             if "503" in error_msg or "overloaded" in error_msg.lower() or "UNAVAILABLE" in error_msg:
                 return {
@@ -232,6 +234,33 @@ ATENȚIE: Summary-ul trebuie să fie un text COMPLET FLUID fără referințe num
                     "sources": ["Eroare tehnică în verificarea automată"]
                 }
 
+    async def _generate_content(self, model: str, contents: str, config, timeout: float):
+        """generate_content in a thread with a timeout; latency, outcome and tokens go to /metrics"""
+        started = time.perf_counter()
+        outcome = "error"
+        response = None
+        try:
+            response = await asyncio.wait_for(
+                asyncio.to_thread(
+                    self.client.models.generate_content,
+                    model=model,
+                    contents=contents,
+                    config=config
+                ),
+                timeout=timeout
+            )
+            outcome = "success"
+            return response
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        except Exception as e:
+            if "503" in str(e) or "overloaded" in str(e).lower() or "UNAVAILABLE" in str(e):
+                outcome = "overloaded"
+            raise
+        finally:
+            metrics.observe_gemini(model, time.perf_counter() - started, outcome, response)
+
     async def _generate_with_retry(self, prompt: str):
         """Try models in exact order: 2.5 Pro -> 2.5 Flash -> 1.5 Pro -> 1.5 Flash"""
         models_to_try = [
@@ -247,15 +276,7 @@ ATENȚIE: Summary-ul trebuie să fie un text COMPLET FLUID fără referințe num
         for i, (model_name, timeout) in enumerate(models_to_try):
             try:
                 logger.info(f"Attempt {i+1}/{len(models_to_try)}: Trying model {model_name} with {timeout}s timeout")
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.client.models.generate_content,
-                        model=model_name,
-                        contents=prompt,
-                        config=self.config
-                    ),
-                    timeout=timeout
-                )
+                response = await self._generate_content(model_name, prompt, self.config, timeout)
                 logger.info(f"SUCCESS with model: {model_name}")
                 return response
                 
@@ -1,12 +1,77 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50  # per pool (sync / async) per process
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds idle before a connection is PINGed on reuse
+    REDIS_CONNECT_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: Optional[float] = None  # None: blocking reads (RQ, XREADGROUP) must not time out
     CORS_ORIGINS: str = "*"
     VOTE_THRESHOLD: int = 25
+    VOTE_FLUSH_INTERVAL: int = 5  # seconds between Redis → Postgres vote flushes
+    BUILD_CHECK_HIGH_VELOCITY: float = 20.0  # votes/hour → high priority build queue
+    BUILD_CHECK_LOW_VELOCITY: float = 1.0  # votes/hour below this → low priority queue
+    BUILD_CHECK_CONCURRENCY: int = 8  # Gemini calls in flight per worker process
+    BUILD_CHECK_COMMIT_BATCH: int = 20  # finished checks per bulk commit
+    BUILD_CHECK_COMMIT_INTERVAL: float = 2.0  # seconds; flush a partial batch after this
+    BUILD_CHECK_MAX_ATTEMPTS: int = 3  # Gemini retries per job, and requeues after an executor crash
+    QUESTION_DEDUPE_THRESHOLD: float = 0.9  # trigram similarity to fold into an existing question (same numbers/negations too)
+    QUESTION_SUGGEST_THRESHOLD: float = 0.6  # above this, a non-foldable match is offered as `duplicate_of`
+    QUESTION_DEDUPE_INDEX_SIZE: int = 50000  # questions kept in the in-process MinHash index
     GEMINI_API_KEY: str = ""  # Will be set via environment variable
+
+    # Hot ranking (exponentially decayed engagement, updated at ingestion)
+    HOT_DECAY_TAU_HOURS: float = 12.0  # e-folding time of an event's weight
+    HOT_MIN_SCORE: float = 0.05  # trimmed from hot:24h once decayed below this
+    HOT_MAX_ENTRIES: int = 5000
+    HOT_PAYLOAD_SIZE: int = 50  # hydrated checks in the cached /fact-checks/hot payload
+    HOT_PAYLOAD_TTL: int = 300  # seconds; the API rebuilds on demand once it expires
+    HOT_RECOMPUTE_INTERVAL: int = 120  # seconds; also the lease TTL, so one recompute per interval
+    HOT_RECOMPUTE_SHARDS: int = 1  # >1 splits a rebuild across `python -m app.worker hot` processes
+
+    # Analytics event stream (XADD at ingest, aggregated by consumer-group workers)
+    EVENTS_STREAM_MAXLEN: int = 1_000_000  # approximate cap; oldest entries are trimmed
+    EVENTS_STREAM_BATCH: int = 500  # entries per XREADGROUP
+    EVENTS_STREAM_CLAIM_IDLE_MS: int = 60_000  # reclaim entries unacked this long
+
+    # Client event-id dedupe (time-bucketed Bloom filter in front of the stream)
+    EVENT_DEDUPE_ENABLED: bool = True
+    EVENT_DEDUPE_WINDOW_SECONDS: int = 600  # retries are caught for 1-2 windows
+    EVENT_DEDUPE_CAPACITY: int = 1_000_000  # event ids per window
+    EVENT_DEDUPE_FP_RATE: float = 0.001  # ~1.8 MB per window at the defaults
+
+    # In-process buffer for events while Redis is unreachable (per API worker)
+    EVENT_BUFFER_SIZE: int = 10_000  # oldest events are dropped beyond this
+    EVENT_BUFFER_RETRY_MAX_SECONDS: float = 30.0  # reconnect backoff cap
+
+    # Trending searches (per-hour Count-Min sketch + top-k, merged into a cached window)
+    TRENDING_TOP_K: int = 200  # queries kept per hour
+    TRENDING_CMS_WIDTH: int = 2048
+    TRENDING_CMS_DEPTH: int = 4  # width * depth * 4 bytes per hour (32 KiB)
+    TRENDING_CACHE_TTL: int = 180  # seconds; the analytics worker refreshes it every interval
+
+    # Analytics key layout (reader HLLs: hourly for recent hours, daily afterwards)
+    HLL_HOURLY_KEEP_HOURS: int = 24  # hours kept at full resolution before the daily rollup (timeseries use days beyond)
+    HLL_DAILY_RETENTION_DAYS: int = 30
+
+    # Database connection pool (per uvicorn worker / process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 disables recycling
+    DB_PGBOUNCER: bool = False  # NullPool + no prepared statements behind PgBouncer
+
+    # Per-request SQL profiling (off by default; adds a little work per statement)
+    SQL_PROFILE_ENABLED: bool = False
+    SQL_PROFILE_SLOW_MS: float = 100.0  # statements slower than this are logged with their parameters
+    SQL_PROFILE_REPEAT_THRESHOLD: int = 5  # same statement this often in one request → N+1 warning
+    SQL_PROFILE_HEADER: bool = False  # X-SQL-Profile response header; debug only
+
+    # Sampling profiler (GET /admin/profile, SIGUSR1 in workers)
+    PROFILE_SIGNAL_SECONDS: float = 30.0
+    PROFILE_DUMP_DIR: str = "/tmp"
     
     # Postgres variables (for docker-compose)
     POSTGRES_DB: str = "factual"
@@ -17,6 +82,17 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "change-me-in-production"
     ADMIN_PASS_SHA256: str = ""
 
+    # Admission control for POST /generate (per API worker)
+    GENERATE_MAX_IN_FLIGHT: int = 8  # concurrent generations while Gemini is fast
+    GENERATE_TARGET_LATENCY: float = 15.0  # seconds; above this median the limit shrinks proportionally
+    GENERATE_ASYNC_MAX_QUEUED: int = 200  # `Prefer: respond-async` requests are shed past this build backlog
+
+    # Rate limits ("N/period", period e.g. second, minute, 5min, hour, day)
+    RATE_LIMIT_GENERATE: str = "10/hour"  # per IP, always applied; each call costs a Gemini request
+    RATE_LIMIT_GENERATE_DEVICE: str = "5/hour"  # extra per X-Device-Id limit on top of the IP one ("" disables)
+    RATE_LIMIT_ADMIN_LOGIN: str = "10/5min"  # per IP
+    TRUSTED_PROXIES: str = ""  # comma-separated CIDRs whose X-Forwarded-For is believed, e.g. 10.0.0.0/8
+
     class Config:
         env_file = ".env"
 
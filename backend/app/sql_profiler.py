@@ -0,0 +1,119 @@
+"""Opt-in per-request SQL profiling (SQL_PROFILE_ENABLED).
+
+Engine events record every statement a request issues. When the
+response starts, the middleware logs:
+- N+1 suspects: the same parameterized statement run SQL_PROFILE_REPEAT_THRESHOLD
+  times or more in one request (typically a lazy-loaded relationship in a loop)
+- statements slower than SQL_PROFILE_SLOW_MS, with their parameters
+
+With SQL_PROFILE_HEADER the summary is also returned in an
+`X-SQL-Profile` header (debug only: it reveals query counts to clients).
+"""
+import contextvars
+import logging
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SLOW_LOGGED = 5
+_PARAMS_PREVIEW = 300
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Counter = Counter()
+        self.slow: List[Tuple[float, str, str]] = []  # (seconds, statement, parameters)
+
+    def record(self, statement: str, parameters, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+        if seconds * 1000 >= settings.SQL_PROFILE_SLOW_MS:
+            self.slow.append((seconds, statement, repr(parameters)[:_PARAMS_PREVIEW]))
+
+    def repeated(self) -> Dict[str, int]:
+        threshold = settings.SQL_PROFILE_REPEAT_THRESHOLD
+        return {stmt: n for stmt, n in self.statements.most_common() if n >= threshold}
+
+    def header(self) -> str:
+        return (
+            f"queries={self.queries}; db_ms={self.db_seconds * 1000:.1f}; "
+            f"repeated={len(self.repeated())}; slow={len(self.slow)}"
+        )
+
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def _one_line(statement: str, limit: int = 200) -> str:
+    return " ".join(statement.split())[:limit]
+
+
+def install(engine):
+    """Attach the statement listeners (only when profiling is enabled)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["profile_query_start"].pop()
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, parameters, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_query_start"):
+            conn.info["profile_query_start"].pop()
+
+
+def report(method: str, path: str, profile: RequestProfile):
+    for statement, count in profile.repeated().items():
+        logger.warning(f"Possible N+1 on {method} {path}: {count}x {_one_line(statement)}")
+    for seconds, statement, parameters in sorted(profile.slow, reverse=True)[:MAX_SLOW_LOGGED]:
+        logger.warning(
+            f"Slow SQL on {method} {path}: {seconds * 1000:.1f} ms {_one_line(statement)} params={parameters}"
+        )
+    logger.debug(f"SQL {method} {path}: {profile.header()}")
+
+
+class SQLProfilerMiddleware:
+    """Pure ASGI middleware; statements issued while streaming the body are not counted"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                report(scope["method"], scope["path"], profile)
+                if settings.SQL_PROFILE_HEADER:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-sql-profile", profile.header().encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
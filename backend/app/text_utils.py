@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+# Romanian text shows up with both comma-below (ș ț) and legacy cedilla (ş ţ) forms
+_RO_FOLD = str.maketrans({
+    "ș": "s", "ş": "s", "Ș": "s", "Ş": "s",
+    "ț": "t", "ţ": "t", "Ț": "t", "Ţ": "t",
+    "ă": "a", "Ă": "a", "â": "a", "Â": "a", "î": "i", "Î": "i",
+})
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def fold_diacritics(value: str) -> str:
+    """Strip Romanian (and any other combining) diacritics"""
+    value = value.translate(_RO_FOLD)
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_text(value: str) -> str:
+    """Lowercase, fold diacritics, drop punctuation and collapse whitespace"""
+    value = fold_diacritics(value.lower())
+    value = _NON_WORD.sub(" ", value)
+    return _SPACES.sub(" ", value).strip()
@@ -0,0 +1,178 @@
+"""Per-fact-check unique-reader time series from the hourly HyperLogLogs.
+
+For each bucket of `step` hours the series has the bucket's unique readers
+(multi-key PFCOUNT) and the cumulative uniques since the window start.
+Finished buckets never change within the hour, so their counts and the
+merged sketch of the finished part are cached until the window shifts;
+a repeat request only counts the live bucket against that one sketch.
+
+Hourly sketches exist for the last HLL_HOURLY_KEEP_HOURS only; older hours
+are read from the daily sketches of app.analytics_rollup, one bucket per
+UTC day (so the first day may include readers from before the window).
+"""
+import json
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.analytics_rollup import daily_key
+from app.settings import settings
+
+MAX_IDS = 50
+_DURATION = re.compile(r"^(\d+)([hd])$")
+
+
+def parse_hours(value: str) -> int:
+    """'48h' -> 48, '2d' -> 48"""
+    m = _DURATION.match(value.strip().lower())
+    if not m:
+        raise ValueError(f"Invalid duration {value!r}; use e.g. 48h or 2d")
+    return int(m.group(1)) * (24 if m.group(2) == "d" else 1)
+
+
+def _hll_key(fact_check_id: str, hour: datetime) -> str:
+    return f"fc:{fact_check_id}:hll:{hour.strftime('%Y%m%d%H')}"
+
+
+@dataclass
+class _Bucket:
+    hours: List[datetime]
+    day: Optional[str] = None  # YYYYMMDD when the hours were rolled into that day's sketch
+
+    def keys(self, fact_check_id: str) -> List[str]:
+        # Hourly keys too for a day: the rollup may not have reached its last hours yet
+        keys = [_hll_key(fact_check_id, h) for h in self.hours]
+        return keys + [daily_key(fact_check_id, self.day)] if self.day else keys
+
+
+def _plan_buckets(hours: List[datetime], step: int, first_hourly: datetime) -> List[_Bucket]:
+    """Whole days before `first_hourly`, then `step`-hour buckets ending with the live hour"""
+    buckets: List[_Bucket] = []
+    recent = []
+    for hour in hours:
+        if hour >= first_hourly:
+            recent.append(hour)
+            continue
+        day = hour.strftime("%Y%m%d")
+        if buckets and buckets[-1].day == day:
+            buckets[-1].hours.append(hour)
+        else:
+            buckets.append(_Bucket([hour], day))
+    head = len(recent) % step
+    if head:
+        buckets.append(_Bucket(recent[:head]))
+    buckets += [_Bucket(recent[i:i + step]) for i in range(head, len(recent), step)]
+    return buckets
+
+
+def _cache_key(fact_check_id: str, window: int, step: int, start: datetime) -> str:
+    return f"fc:{fact_check_id}:ts:{window}:{step}:{start.strftime('%Y%m%d%H')}"
+
+
+def _count(r, plans: List[tuple], finished: List[_Bucket], live: _Bucket, ttl: int):
+    """One pipeline for (id, cache key, cached JSON or None) triples.
+
+    Returns the series per id, the JSON to cache for cold ids, and the ids
+    whose cached JSON outlived its merged sketch.
+    """
+    pipe = r.pipeline(transaction=False)
+    for fc_id, cache_key, raw in plans:
+        sketch = f"{cache_key}:hll"
+        if raw is None and finished:
+            # Cold: walk the finished buckets once, folding each into an accumulator
+            acc = f"{sketch}:{uuid.uuid4().hex[:8]}"
+            pipe.pfadd(acc)  # empty sketch, so RENAME works even with no readers
+            pipe.expire(acc, ttl)  # at once: a failed pipeline leaves nothing behind for good
+            for bucket in finished:
+                keys = bucket.keys(fc_id)
+                pipe.pfcount(*keys)
+                pipe.pfmerge(acc, acc, *keys)
+                pipe.pfcount(acc)
+            pipe.rename(acc, sketch)
+            pipe.expire(sketch, ttl)  # and on the final key, whatever PFMERGE did to acc's TTL
+        elif finished:
+            pipe.exists(sketch)
+        live_keys = live.keys(fc_id)
+        pipe.pfcount(*live_keys)
+        if finished:
+            pipe.pfcount(sketch, *live_keys)
+    replies = iter(pipe.execute())
+
+    series: Dict[str, dict] = {}
+    fresh: Dict[str, str] = {}
+    stale: List[str] = []
+    for fc_id, cache_key, raw in plans:
+        if raw is not None:
+            done = json.loads(raw)
+            if finished and not next(replies):  # EXISTS
+                stale.append(fc_id)
+                next(replies), next(replies)  # live counts against a missing sketch
+                continue
+        else:
+            done = {"uniques": [], "cumulative": []}
+            if finished:
+                next(replies), next(replies)  # PFADD, EXPIRE
+            for _ in finished:
+                done["uniques"].append(int(next(replies)))
+                next(replies)  # PFMERGE
+                done["cumulative"].append(int(next(replies)))
+            if finished:
+                next(replies), next(replies)  # RENAME, EXPIRE
+                fresh[cache_key] = json.dumps(done)
+        live_uniques = int(next(replies))
+        live_cumulative = int(next(replies)) if finished else live_uniques
+        series[fc_id] = {
+            "fact_check_id": fc_id,
+            "uniques": done["uniques"] + [live_uniques],
+            "cumulative": done["cumulative"] + [live_cumulative],
+            "total_uniques": live_cumulative,
+        }
+    return series, fresh, stale
+
+
+def fact_check_series(r, fact_check_ids: List[str], window: int, step: int, now: Optional[datetime] = None) -> dict:
+    """Series for every id in two pipelined round trips (plus one cache write on a miss,
+    and one recount if a cached part lost its sketch)"""
+    if window % step:
+        raise ValueError("window must be a multiple of step")
+    if window > settings.HLL_DAILY_RETENTION_DAYS * 24:
+        raise ValueError(f"Reader sketches are kept for {settings.HLL_DAILY_RETENTION_DAYS} days")
+
+    now = now or datetime.now(timezone.utc)
+    current = now.replace(minute=0, second=0, microsecond=0)
+    hours = [current - timedelta(hours=window - 1 - i) for i in range(window)]
+    # Same cutoff as rollup_hourly_sketches: older hours may already be merged into days
+    first_hourly = current - timedelta(hours=settings.HLL_HOURLY_KEEP_HOURS)
+    buckets = _plan_buckets(hours, step, first_hourly)
+    finished, live = buckets[:-1], buckets[-1]
+    # Cached parts stay valid until the window moves at the next hour. The JSON is
+    # written after its sketch, so it expires last: a hit is checked with EXISTS.
+    ttl = int((current + timedelta(hours=1) - now).total_seconds()) + 60
+
+    cache_keys = [_cache_key(fc_id, window, step, hours[0]) for fc_id in fact_check_ids]
+    cached = r.mget(cache_keys)
+
+    plans = list(zip(fact_check_ids, cache_keys, cached))
+    series, fresh, stale = _count(r, plans, finished, live, ttl)
+    if stale:
+        # Sketch evicted or expired between the MGET and the count: treat as a miss
+        retry = [(fc_id, cache_key, None) for fc_id, cache_key, _ in plans if fc_id in stale]
+        recounted, refreshed, _ = _count(r, retry, finished, live, ttl)
+        series.update(recounted)
+        fresh.update(refreshed)
+
+    if fresh:
+        pipe = r.pipeline(transaction=False)
+        for key, value in fresh.items():
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+    return {
+        "window_hours": window,
+        "step_hours": step,
+        "hourly_since": max(first_hourly, hours[0]).isoformat(),
+        "buckets": [bucket.hours[0].isoformat() for bucket in buckets],
+        "series": [series[fc_id] for fc_id in fact_check_ids],
+    }
@@ -0,0 +1,114 @@
+"""Trending searches with bounded memory.
+
+Each hour has a Count-Min sketch (`search:cms:{hour}`, a fixed-size
+BITFIELD of u32 counters) and a top-k ZSET (`search:top:{hour}`) holding
+at most TRENDING_TOP_K queries scored by their sketch estimate. Long-tail
+queries only ever touch the sketch. The rolling window is a ZUNIONSTORE
+of the hourly top-k sets, cached in `search:trending:{hours}h`.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.redis_client import queue_script
+from app.settings import settings
+from app.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_LENGTH = 100
+HOUR_TTL = 60 * 60 * 48
+MAX_WINDOW_HOURS = 48
+
+# KEYS: sketch, top-k zset
+# ARGV: normalized query, k, ttl, then one counter index per sketch row
+_RECORD_SCRIPT = """
+local est = nil
+for i = 4, #ARGV do
+    local v = redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'SAT', 'INCRBY', 'u32', '#' .. ARGV[i], 1)[1]
+    if est == nil or v < est then est = v end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) or redis.call('ZCARD', KEYS[2]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[2], est, ARGV[1])
+else
+    local low = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+    if est > tonumber(low[2]) then
+        redis.call('ZREM', KEYS[2], low[1])
+        redis.call('ZADD', KEYS[2], est, ARGV[1])
+    end
+end
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return est
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Same key for "Ședința" / "Şedinta" / "sedinta " """
+    return normalize_text(query)[:MAX_QUERY_LENGTH].strip()
+
+
+def sketch_key(hour: str) -> str:
+    return f"search:cms:{hour}"
+
+
+def top_key(hour: str) -> str:
+    return f"search:top:{hour}"
+
+
+def window_key(hours: int) -> str:
+    return f"search:trending:{hours}h"
+
+
+def counter_indexes(query: str, width: int, depth: int) -> List[int]:
+    """One counter per sketch row, flattened to BITFIELD u32 slots (row * width + column)"""
+    digest = hashlib.blake2b(query.encode("utf-8"), digest_size=4 * depth).digest()
+    return [
+        row * width + int.from_bytes(digest[row * 4:(row + 1) * 4], "big") % width
+        for row in range(depth)
+    ]
+
+
+class TrendingSearches:
+    """Registers the record script once per Redis client (sync or asyncio)"""
+
+    def __init__(self, r):
+        self.r = r
+        self._record = r.register_script(_RECORD_SCRIPT)
+
+    def record(self, pipe, query: str, hour: str) -> bool:
+        """Queue one search on `pipe`; False if nothing is left after normalization"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return False
+        indexes = counter_indexes(normalized, settings.TRENDING_CMS_WIDTH, settings.TRENDING_CMS_DEPTH)
+        queue_script(
+            pipe,
+            self._record,
+            keys=[sketch_key(hour), top_key(hour)],
+            args=[normalized, settings.TRENDING_TOP_K, HOUR_TTL, *indexes],
+        )
+        return True
+
+
+def refresh_window(r, hours: int = 24, now: Optional[datetime] = None) -> int:
+    """Rebuild the cached rolling top-k from the hourly top-k sets"""
+    now = now or datetime.now(timezone.utc)
+    hour_keys = [top_key((now - timedelta(hours=i)).strftime("%Y%m%d%H")) for i in range(hours)]
+    pipe = r.pipeline(transaction=True)
+    pipe.zunionstore(window_key(hours), hour_keys)
+    pipe.expire(window_key(hours), settings.TRENDING_CACHE_TTL)
+    return int(pipe.execute()[0])
+
+
+def trending(r, hours: int = 24, limit: int = 20) -> List[Dict]:
+    """Cached window in one ZREVRANGE; rebuilt only when the cache expired"""
+    hours = max(1, min(hours, MAX_WINDOW_HOURS))
+    top = r.zrevrange(window_key(hours), 0, limit - 1, withscores=True)
+    if not top and refresh_window(r, hours):
+        top = r.zrevrange(window_key(hours), 0, limit - 1, withscores=True)
+    return [
+        {"query": q.decode("utf-8") if isinstance(q, bytes) else q, "count": int(count)}
+        for q, count in top
+    ]
@@ -0,0 +1,188 @@
+"""Redis-buffered vote counting.
+
+A vote is one Lua call: per-device dedupe (SADD), atomic increment of the
+question counter and an append to the pending buffer. `flush_votes`
+periodically drains the buffer into Postgres with one bulk INSERT of
+`Vote` rows and one UPDATE per question. Each buffered entry carries the
+id of its future Vote row and the INSERT skips ids already present, so
+replaying a batch that was committed but not trimmed (crash, Redis error)
+adds nothing.
+
+While Redis is down votes go straight to Postgres (`record_vote_db`). The
+counter never drops below the Postgres count, so it catches up with those
+votes even if Redis can't be told about them at write time.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.redis_client import get_redis
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "votes:buffer"
+FLUSHING_KEY = "votes:buffer:flushing"
+
+# KEYS: devices set, counter, threshold-fired flag, buffer
+# ARGV: device id ("" = anonymous), count already in Postgres, threshold, buffer entry
+_VOTE_SCRIPT = """
+local n = math.max(tonumber(redis.call('GET', KEYS[2]) or 0), tonumber(ARGV[2]))
+if ARGV[1] ~= '' and redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return {0, n, 0}
+end
+n = n + 1
+redis.call('SET', KEYS[2], n)
+redis.call('RPUSH', KEYS[4], ARGV[4])
+local fired = 0
+if n >= tonumber(ARGV[3]) and redis.call('SET', KEYS[3], '1', 'NX') then
+    fired = 1
+end
+return {1, n, fired}
+"""
+
+# After a Postgres-only vote: remember the device, count the vote if a counter exists
+# (a missing one is seeded from Postgres by the next vote) and mark a threshold it fired
+# KEYS: devices set, counter, threshold-fired flag
+# ARGV: device id ("" = anonymous), "1" if this vote fired the threshold
+_SYNC_SCRIPT = """
+if ARGV[1] ~= '' then
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('INCR', KEYS[2])
+end
+if ARGV[2] == '1' then
+    redis.call('SET', KEYS[3], '1')
+end
+"""
+
+_scripts = {}
+
+
+def _script(source: str):
+    """`source` registered on this process's client (looked up per call, so forks get their own)"""
+    r = get_redis()
+    script = _scripts.get((id(r), source))
+    if script is None:
+        script = _scripts[(id(r), source)] = r.register_script(source)
+    return script
+
+
+@dataclass
+class VoteResult:
+    accepted: bool  # False when this device already voted
+    votes_count: int
+    threshold_reached: bool  # True for exactly one vote per question
+
+
+def _keys(question_id: str):
+    return [
+        f"votes:q:{question_id}:devices",
+        f"votes:q:{question_id}:count",
+        f"votes:q:{question_id}:fired",
+        BUFFER_KEY,
+    ]
+
+
+def record_vote(question: models.Question, device_id: Optional[str]) -> VoteResult:
+    """Count a vote in Redis; the Postgres write happens later in `flush_votes`"""
+    entry = json.dumps({"id": uuid.uuid4().hex, "q": question.id, "d": device_id, "ts": time.time()})
+    accepted, count, fired = _script(_VOTE_SCRIPT)(
+        keys=_keys(question.id),
+        args=[device_id or "", question.votes_count or 0, settings.VOTE_THRESHOLD, entry],
+    )
+    return VoteResult(bool(accepted), int(count), bool(fired))
+
+
+def record_vote_db(db: Session, question: models.Question, device_id: Optional[str]) -> VoteResult:
+    """Fallback when Redis is down: atomic in-database increment plus a Vote row"""
+    if device_id and db.query(models.Vote.id).filter(
+        models.Vote.question_id == question.id, models.Vote.device_id == device_id
+    ).first():
+        return VoteResult(False, question.votes_count, False)
+
+    db.execute(
+        update(models.Question)
+        .where(models.Question.id == question.id)
+        .values(votes_count=models.Question.votes_count + 1)
+    )
+    db.add(models.Vote(id=f"v_{uuid.uuid4().hex}", question_id=question.id, device_id=device_id))
+    db.commit()
+    db.refresh(question)
+    # The caller's conditional UPDATE (status='open') makes sure only one vote enqueues the build
+    fired = question.votes_count >= settings.VOTE_THRESHOLD
+    try:
+        _script(_SYNC_SCRIPT)(keys=_keys(question.id)[:3], args=[device_id or "", "1" if fired else "0"])
+    except Exception as e:
+        logger.info(f"Vote counter for {question.id} not synced, next vote catches up from Postgres: {e}")
+    return VoteResult(True, question.votes_count, fired)
+
+
+def _vote_id(raw: str, entry: dict) -> str:
+    # Entries buffered before ids were added get one derived from their content
+    return f"v_{entry.get('id') or hashlib.sha1(raw.encode()).hexdigest()[:32]}"
+
+
+def _insert_new_votes(db: Session, rows: list) -> Counter:
+    """INSERT ... ON CONFLICT DO NOTHING; returns inserted rows per question"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    table = models.Vote.__table__
+    stmt = insert(table).on_conflict_do_nothing(index_elements=["id"]).returning(table.c.question_id)
+    return Counter(db.execute(stmt, rows).scalars())
+
+
+def flush_votes(db: Session, batch_size: int = 5000) -> int:
+    """Move buffered votes into Postgres. Returns the number of votes written."""
+    redis_votes = get_redis()
+    # A leftover FLUSHING_KEY means the previous flush died before DEL; retry it first
+    if not redis_votes.exists(FLUSHING_KEY):
+        try:
+            redis_votes.rename(BUFFER_KEY, FLUSHING_KEY)
+        except Exception:
+            return 0  # buffer empty (RENAME of a missing key raises)
+
+    written = 0
+    while True:
+        raw = redis_votes.lrange(FLUSHING_KEY, 0, batch_size - 1)
+        if not raw:
+            break
+        rows = []
+        for item in raw:
+            e = json.loads(item)
+            rows.append({
+                "id": _vote_id(item, e),
+                "question_id": e["q"],
+                "device_id": e["d"],
+                "created_at": datetime.utcfromtimestamp(e["ts"]),
+            })
+        try:
+            # Only rows actually inserted count: a replayed batch is a no-op
+            per_question = _insert_new_votes(db, rows)
+            for question_id, n in per_question.items():
+                db.execute(
+                    update(models.Question)
+                    .where(models.Question.id == question_id)
+                    .values(votes_count=models.Question.votes_count + n)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        redis_votes.ltrim(FLUSHING_KEY, len(raw), -1)
+        written += sum(per_question.values())
+
+    redis_votes.delete(FLUSHING_KEY)
+    return written
@@ -1,75 +1,129 @@
 import os
 import asyncio
 import time
-from redis import Redis
 from rq import Queue, Worker, Connection
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
-import uuid
+from typing import Dict
 
 from app.settings import settings
 from app.db import SessionLocal
-from app import models
+from app.redis_client import get_redis
 
-redis_conn = Redis.from_url(settings.REDIS_URL)
-queue = Queue("build_check", connection=redis_conn)
+def rq_connection():
+    """RQ's client (it stores pickled bytes). Looked up on every use, never bound at
+    import: a forked work-horse or preloaded app worker must not share its parent's pool."""
+    return get_redis(decode_responses=False)
 
-def enqueue_build_check(question_id: str):
-    queue.enqueue(run_build_check, question_id, job_timeout=600)
-async def compute_hot_score(fact_check_id: str, now: datetime) -> float:
-    """Compute hot score for a fact-check using time decay and engagement"""
+# Cozi în ordinea priorității; workerul le golește pe cele de sus mai întâi
+BUILD_QUEUES = ["build_check:high", "build_check", "build_check:low"]
+
+def build_queues() -> Dict[str, Queue]:
+    connection = rq_connection()
+    return {name: Queue(name, connection=connection) for name in BUILD_QUEUES}
+
+# Helpers for sharded hot-score rebuilds (`python -m app.worker hot`)
+def hot_queue() -> Queue:
+    return Queue("hot_scores", connection=rq_connection())
+
+BUILD_JOB_TIMEOUT = 600
+BUILD_JOB_TTL = 60 * 60 * 24  # cât poate sta un job în coadă înainte să expire
+
+def build_job_id(question_id: str) -> str:
+    return f"build_check:{question_id}"
+
+def _claim_key(question_id: str) -> str:
+    return f"build_check:claim:{question_id}"
+
+def build_priority(votes_count: int, created_at: datetime | None = None) -> str:
+    """Pick the queue tier from vote count and vote velocity (votes/hour since creation)"""
+    if votes_count >= 2 * settings.VOTE_THRESHOLD:
+        return "build_check:high"
+    if created_at is None:
+        return "build_check"
+    age_hours = max(0.25, (datetime.utcnow() - created_at).total_seconds() / 3600.0)
+    velocity = votes_count / age_hours
+    if velocity >= settings.BUILD_CHECK_HIGH_VELOCITY:
+        return "build_check:high"
+    if velocity < settings.BUILD_CHECK_LOW_VELOCITY:
+        return "build_check:low"
+    return "build_check"
+
+def enqueue_build_check(question_id: str, votes_count: int = 0, created_at: datetime | None = None) -> bool:
+    """Enqueue the build job unless one is already queued or running. Returns True if enqueued."""
+    # SET NX e atomic: voturi concurente la prag sau acțiuni repetate nu dublează jobul
+    if not rq_connection().set(_claim_key(question_id), "1", nx=True, ex=BUILD_JOB_TTL + BUILD_JOB_TIMEOUT):
+        return False
     try:
-        from app.routers.analytics import hll_unique_count, get_fact_check_created_at
-        import math
-        
-        uni_2h = await hll_unique_count(fact_check_id, 2, now)
-        uni_24h = await hll_unique_count(fact_check_id, 24, now)
-        
-        created_at = await get_fact_check_created_at(fact_check_id)
-        age_hours = max(0.0, (now - created_at).total_seconds() / 3600.0)
-        
-        score = (uni_2h * 5 + uni_24h * 2) * math.exp(-age_hours / 24.0)
-        return score
-    except Exception as e:
-        print(f"Error computing hot score for {fact_check_id}: {e}")
-        return 0.0
+        build_queues()[build_priority(votes_count, created_at)].enqueue_call(
+            run_build_check,
+            args=(question_id,),
+            job_id=build_job_id(question_id),
+            timeout=BUILD_JOB_TIMEOUT,
+            ttl=BUILD_JOB_TTL,
+            on_failure=_on_build_check_failure,
+        )
+    except Exception:
+        rq_connection().delete(_claim_key(question_id))
+        raise
+    return True
+
+def release_build_check(question_id: str):
+    """Allow the question to be enqueued again (job finished or failed)"""
+    rq_connection().delete(_claim_key(question_id))
+
+def _on_build_check_failure(job, connection, type, value, traceback):
+    # Acoperă și timeout-ul, când finally din run_build_check nu mai rulează
+    release_build_check(job.args[0])
+def score_hot_shards(gen: str, shards: int, now_ts: float):
+    from app.hot_scores import score_shards
+    return score_shards(rq_connection(), gen, shards, now_ts)
+
+def fan_out_hot_shards(gen: str, shards: int, now_ts: float):
+    """One helper job per extra shard; the caller scores shards too, so stale jobs just no-op"""
+    for _ in range(shards - 1):
+        hot_queue().enqueue(score_hot_shards, gen, shards, now_ts, ttl=60, result_ttl=0, job_timeout=300)
 
 async def recompute_hot_scores():
-    """Background task to recompute hot scores every 2 minutes"""
-    r = redis_conn
-    now = datetime.now(timezone.utc)
-    
+    """Trim the incrementally maintained hot ranking and republish the payload, once per interval"""
+    from app.hot_scores import maintain_hot_scores, publish_hot_payload, recompute_lease
+
+    lease = recompute_lease(rq_connection())
+    if not lease.acquire():
+        print("⏭️ Hot scores already recomputed this interval by another process")
+        return
+
     try:
-        # Get all candidates that have had recent activity
-        candidates = r.zrange("hot:candidates", 0, -1)
-        
-        if not candidates:
-            print("📊 No hot candidates found")
-            return
-            
-        scores = {}
-        for fact_check_id in candidates:
-            if isinstance(fact_check_id, bytes):
-                fact_check_id = fact_check_id.decode('utf-8')
-            score = await compute_hot_score(fact_check_id, now)
-            scores[fact_check_id] = score
-        
-        # Update the hot ranking
-        if scores:
-            r.zadd("hot:24h", scores)
-            r.expire("hot:24h", 60*15)  # 15 minute expiry
-            
-            top_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
-            print(f"🔥 Updated hot scores for {len(scores)} fact-checks. Top 3: {top_scores}")
+        # Sync Redis client: keep the calls off the event loop
+        result = await asyncio.to_thread(maintain_hot_scores, rq_connection(), fan_out=fan_out_hot_shards)
+        payload = await asyncio.to_thread(publish_hot_payload, rq_connection())
+        top_scores = list(result["top_scores"].items())[:3]
+        if "computed" in result:
+            print(f"🔥 Rebuilt hot scores for {result['computed']} fact-checks "
+                  f"({result['shards']} shards) in {result['elapsed_ms']}ms. Top 3: {top_scores}")
         else:
-            print("📊 No scores computed")
-            
+            print(f"🔥 Hot ranking: {result['size']} entries, trimmed {result['trimmed']} "
+                  f"in {result['elapsed_ms']}ms. Top 3: {top_scores}")
+        print(f"📦 Published hot payload: {len(payload['items'])} checks, "
+              f"{len(payload['categories'])} categories")
+
     except Exception as e:
+        lease.release()  # let the next process retry instead of waiting out the interval
         print(f"❌ Error computing hot scores: {e}")
 
+async def refresh_trending():
+    """Rebuild the cached 24h trending window so the endpoint is a single ZREVRANGE"""
+    from app.trending import refresh_window
+
+    try:
+        queries = await asyncio.to_thread(refresh_window, rq_connection())
+        print(f"🔎 Trending window refreshed: {queries} queries")
+    except Exception as e:
+        print(f"❌ Error refreshing trending searches: {e}")
+
 async def cleanup_old_data():
     """Clean up old analytics data every hour"""
-    r = redis_conn
+    r = rq_connection()
     
     try:
         # Clean up candidates that haven't been active recently
@@ -77,6 +131,24 @@ async def cleanup_old_data():
         removed = r.zremrangebyscore("hot:candidates", 0, 1)
         if removed:
             print(f"🧹 Cleaned up {removed} inactive candidates")
+
+        # Persist settled hours to Postgres before their sketches are rolled up
+        from app.analytics_history import persist_hourly_rollups
+        db: Session = SessionLocal()
+        try:
+            persisted = await asyncio.to_thread(persist_hourly_rollups, get_redis(), db)
+        finally:
+            db.close()
+        if persisted["hours"]:
+            print(f"🗄️ Persisted {persisted['hours']} hours to Postgres: {persisted['fact_check_rows']} "
+                  f"fact-check rows, {persisted['search_term_rows']} search-term rows in {persisted['elapsed_ms']}ms")
+
+        # Fold finished hourly reader sketches into daily ones
+        from app.analytics_rollup import rollup_hourly_sketches
+        rollup = await asyncio.to_thread(rollup_hourly_sketches, r)
+        if rollup["hours_merged"]:
+            print(f"🗜️ Rolled {rollup['hours_merged']} hourly HLLs into "
+                  f"{rollup['daily_sketches']} daily sketches in {rollup['elapsed_ms']}ms")
             
     except Exception as e:
         print(f"❌ Error during cleanup: {e}")
@@ -89,16 +161,16 @@ async def analytics_worker():
     
     while True:
         try:
-            # Recompute hot scores every 2 minutes
+            # Recompute hot scores (skipped if another replica holds the lease)
             await recompute_hot_scores()
+            await refresh_trending()
             
             # Cleanup every hour
             if time.time() - last_cleanup > 3600:  # 1 hour
                 await cleanup_old_data()
                 last_cleanup = time.time()
                 
-            # Wait 2 minutes before next run
-            await asyncio.sleep(120)
+            await asyncio.sleep(settings.HOT_RECOMPUTE_INTERVAL)
             
         except KeyboardInterrupt:
             print("🛑 Analytics worker stopped by user")
@@ -107,47 +179,92 @@ async def analytics_worker():
             print(f"❌ Analytics worker error: {e}")
             await asyncio.sleep(30)  # Wait 30s before retry
 
-# Job logic (MVP placeholder): creează un check "unclear"
+async def vote_flush_worker():
+    """Drain Redis-buffered votes into Postgres in batches"""
+    from app.votes import flush_votes
+    print("🗳️ Starting vote flush worker...")
+
+    while True:
+        db: Session = SessionLocal()
+        try:
+            written = flush_votes(db)
+            if written:
+                print(f"🗳️ Flushed {written} votes to Postgres")
+        except Exception as e:
+            print(f"❌ Vote flush error: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.VOTE_FLUSH_INTERVAL)
+
+async def event_stream_worker():
+    """Aggregate analytics events from the stream; run more of these to scale out"""
+    from app.event_stream import StreamConsumer, stream_stats
+
+    r = get_redis()
+    consumer = StreamConsumer(r)
+    print(f"📥 Starting event stream consumer {consumer.name}...")
+    last_claim = last_report = time.time()
+
+    while True:
+        try:
+            await asyncio.to_thread(consumer.read_batch)
+
+            # Pick up batches a crashed consumer read but never acked
+            if time.time() - last_claim > 30:
+                reclaimed = await asyncio.to_thread(consumer.reclaim)
+                if reclaimed:
+                    print(f"♻️ Reclaimed {reclaimed} unacked events")
+                last_claim = time.time()
+
+            if time.time() - last_report > 60:
+                stats = await asyncio.to_thread(stream_stats, r)
+                print(f"📊 Events: processed={consumer.processed} reclaimed={consumer.reclaimed} "
+                      f"lag={stats.get('lag')} pending={stats.get('pending')} length={stats['length']}")
+                last_report = time.time()
+
+        except Exception as e:
+            print(f"❌ Event stream error: {e}")
+            await asyncio.sleep(5)
+
+# Job logic: generare reală cu Gemini (vezi app/build_checks.py)
 
 def run_build_check(question_id: str):
-    db: Session = SessionLocal()
+    from app.build_checks import build_check_sync
     try:
-        q = db.query(models.Question).get(question_id)
-        if not q:
-            return
-        # Dacă există deja un check, nu mai crea
-        exists = db.query(models.Check).filter(models.Check.question_id == q.id).first()
-        if exists:
-            return
-        c = models.Check(
-            id=f"c_{uuid.uuid4().hex[:10]}",
-            question_id=q.id,
-            title=q.title,
-            verdict="unclear",
-            confidence=0,
-            summary=None,
-            auto_generated=True,
-            status="draft",
-            published_at=None,
-            created_at=datetime.utcnow(),
-        )
-        q.status = "checked"  # sau rămâne queued până la publish manual
-        db.add(c)
-        db.commit()
+        build_check_sync(question_id)
     finally:
-        db.close()
+        release_build_check(question_id)
 
 # Rulare worker (doar în containerul worker)
 if __name__ == "__main__":
     import sys
+    from app.profiler import install_signal_handler
+
+    # kill -USR1 <pid> → profil în PROFILE_DUMP_DIR (la RQ clasic: pid-ul work-horse-ului pentru job)
+    install_signal_handler()
     
     if len(sys.argv) > 1 and sys.argv[1] == "analytics":
         # Run only analytics worker
         print("🚀 Starting Analytics worker...")
         asyncio.run(analytics_worker())
-    else:
-        # Default: run only RQ worker (existing behavior)
+    elif len(sys.argv) > 1 and sys.argv[1] == "events":
+        asyncio.run(event_stream_worker())
+    elif len(sys.argv) > 1 and sys.argv[1] == "votes":
+        asyncio.run(vote_flush_worker())
+    elif len(sys.argv) > 1 and sys.argv[1] == "hot":
+        # Scale these out to split hot-score rebuilds (HOT_RECOMPUTE_SHARDS > 1)
+        print("🚀 Starting hot-score shard worker...")
+        with Connection(rq_connection()):
+            Worker([hot_queue()]).work()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rq":
+        # Classic RQ worker: one job at a time in a forked process
         print("🚀 Starting RQ worker...")
-        with Connection(redis_conn):
-            worker = Worker(["build_check"])
+        with Connection(rq_connection()):
+            worker = Worker(BUILD_QUEUES)
             worker.work()
+    else:
+        # Default: asyncio executor with N Gemini calls in flight
+        from app.build_checks import BuildCheckExecutor
+        print("🚀 Starting build-check executor...")
+        executor = BuildCheckExecutor(list(build_queues().values()))
+        asyncio.run(executor.run())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark pentru ingestia de evenimente: evenimente/secundă pe un worker
+(un singur event loop), POST /events unul câte unul vs POST /events/batch.
+
+    # direct pe Redis, fără HTTP (aceeași logică ca endpoint-urile)
+    REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_events --events 50000
+
+    # end-to-end contra unui uvicorn pornit cu --workers 1 (necesită httpx)
+    python -m benchmarks.bench_events --url http://localhost:8000 --events 20000
+
+Măsoară doar ingestia (XADD în events:stream); agregarea o face
+`python -m app.worker events`. Folosește o bază Redis separată.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+
+def make_events(n: int, fact_checks: int = 500):
+    types = ["open"] * 6 + ["read_complete", "share", "search", "question"]
+    events = []
+    for _ in range(n):
+        kind = random.choice(types)
+        event = {"type": kind, "uid": f"bench-{random.randrange(20_000):06d}"}
+        if kind in ("open", "read_complete", "share"):
+            event["fact_check_id"] = f"bench-fc-{random.randrange(fact_checks)}"
+        elif kind == "search":
+            event["query"] = random.choice(["Ședința guvernului", "pensii", "vaccin", f"coada {uuid.uuid4().hex[:6]}"])
+        else:
+            event["question"] = f"Este adevărat că {uuid.uuid4().hex[:8]}?"
+        events.append(event)
+    return events
+
+
+async def run_direct(events, batch_size: int, concurrency: int) -> float:
+    from app.routers import analytics
+
+    parsed = [analytics.Event(**e) for e in events]
+    batches = [parsed[i:i + batch_size] for i in range(0, len(parsed), batch_size)]
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(batch):
+        async with slots:
+            pipe = analytics.ar.pipeline(transaction=False)
+            for event in batch:
+                analytics.event_publisher.queue(pipe, event)
+            await pipe.execute()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(b) for b in batches))
+    return time.perf_counter() - started
+
+
+async def run_http(url: str, events, batch_size: int, concurrency: int) -> float:
+    import httpx
+
+    slots = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        async def send(i):
+            async with slots:
+                if batch_size == 1:
+                    resp = await client.post("/events", json=events[i])
+                else:
+                    resp = await client.post("/events/batch", json={"events": events[i:i + batch_size]})
+                resp.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(0, len(events), batch_size)))
+        return time.perf_counter() - started
+
+
+async def main(args):
+    events = make_events(args.events)
+    # One event loop for every run: the async Redis pool is bound to it
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        if args.url:
+            elapsed = await run_http(args.url, events, batch_size, args.concurrency)
+        else:
+            elapsed = await run_direct(events, batch_size, args.concurrency)
+        label = "/events" if batch_size == 1 else f"/events/batch x{batch_size}"
+        print(f"{label:>22}: {len(events):,} events in {elapsed:.2f}s → {len(events) / elapsed:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--batch-sizes", default="1,20,100,500")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--url", help="benchmark a running API instead of calling Redis directly")
+    asyncio.run(main(parser.parse_args()))
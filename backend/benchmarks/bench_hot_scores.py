@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark pentru scorurile hot: implementarea veche (PFMERGE în cheie
+temporară + PFCOUNT + DEL, secvențial, de două ori per candidat) vs
+rebuild-ul batched și trim-ul periodic din app.hot_scores.
+
+    REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_hot_scores --candidates 100000
+
+Folosește o bază Redis separată - cheile fc:*, hot:* sunt suprascrise.
+"""
+import argparse
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from redis import Redis
+
+from app import hot_scores
+from app.settings import settings
+
+
+def populate(r: Redis, candidates: int, hours: int, now: datetime):
+    r.delete(hot_scores.CANDIDATES_KEY)
+    started = time.perf_counter()
+    pipe = r.pipeline(transaction=False)
+    for n in range(candidates):
+        fc_id = f"bench-{n}"
+        for key in random.sample(hot_scores.hour_keys(fc_id, 24, now), hours):
+            pipe.pfadd(key, *[f"u{random.randrange(5000)}" for _ in range(5)])
+            pipe.expire(key, 3600)
+        pipe.zincrby(hot_scores.CANDIDATES_KEY, random.randint(1, 50), fc_id)
+        if n % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+    print(f"Populated {candidates:,} candidates in {time.perf_counter() - started:.1f}s")
+
+
+def legacy_recompute(r: Redis, now: datetime) -> int:
+    """Old path: two temp-key merges per candidate, one command at a time"""
+    scores = {}
+    for fc_id in r.zrange(hot_scores.CANDIDATES_KEY, 0, -1):
+        counts = []
+        for hours in (2, 24):
+            tmp_key = f"tmp:hll:{fc_id}:{hours}:{uuid.uuid4().hex[:8]}"
+            r.pfmerge(tmp_key, *hot_scores.hour_keys(fc_id, hours, now))
+            counts.append(r.pfcount(tmp_key))
+            r.delete(tmp_key)
+        scores[fc_id] = (counts[0] * 5 + counts[1] * 2) * math.exp(-12.0 / 24.0)
+    r.zadd(hot_scores.HOT_KEY, scores)
+    return len(scores)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=100_000)
+    parser.add_argument("--hours", type=int, default=6, help="active hour buckets per candidate")
+    parser.add_argument("--chunk-size", type=int, default=hot_scores.CHUNK_SIZE)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--skip-populate", action="store_true")
+    args = parser.parse_args()
+
+    r = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    now = datetime.now(timezone.utc)
+    if not args.skip_populate:
+        populate(r, args.candidates, args.hours, now)
+
+    started = time.perf_counter()
+    result = hot_scores.rebuild_hot_scores(r, now, chunk_size=args.chunk_size)
+    print(f"rebuild: {result['computed']:,} candidates in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    result = hot_scores.maintain_hot_scores(r, now)
+    print(f"   trim: {result['size']:,} entries in {time.perf_counter() - started:.3f}s")
+
+    if not args.skip_legacy:
+        started = time.perf_counter()
+        computed = legacy_recompute(r, now)
+        print(f" legacy: {computed:,} candidates in {time.perf_counter() - started:.2f}s")
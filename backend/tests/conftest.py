@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# app.settings requires DATABASE_URL at import; tests use their own engines
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """Session on a scratch SQLite database with every table created"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app import models  # noqa: F401  (registers the tables)
+    from app.db import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(decode_responses=True)
@@ -0,0 +1,73 @@
+"""Build-check retries within the job timeout, and recovery of jobs left by a dead executor."""
+import asyncio
+import time
+
+import pytest
+
+from app import build_checks, worker
+from app.settings import settings
+
+
+def test_retries_stop_within_budget(monkeypatch):
+    calls = []
+
+    async def failing(question_id, title):
+        calls.append(time.perf_counter())
+        raise RuntimeError("503 from Gemini")
+
+    monkeypatch.setattr(build_checks, "load_question_title", lambda question_id: "Titlu")
+    monkeypatch.setattr(build_checks, "generate_check", failing)
+
+    started = time.perf_counter()
+    result = asyncio.run(build_checks.build_one("q_1", max_attempts=5, budget=2))
+
+    assert len(calls) == 1  # the 5s backoff would overrun the 2s budget
+    assert result.error == "503 from Gemini"
+    assert time.perf_counter() - started < 1
+
+
+def test_slow_generation_is_cut_at_budget(monkeypatch):
+    async def hanging(question_id, title):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(build_checks, "load_question_title", lambda question_id: "Titlu")
+    monkeypatch.setattr(build_checks, "generate_check", hanging)
+
+    result = asyncio.run(build_checks.build_one("q_1", max_attempts=3, budget=0.2))
+
+    assert result.check is None and result.error.startswith("timed out")
+
+
+@pytest.fixture
+def rq_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    conn = fakeredis.FakeRedis()
+    monkeypatch.setattr(worker, "rq_connection", lambda: conn)
+    return conn
+
+
+def _abandon(conn, queues):
+    """Dequeue like an executor, then die: the registry entry is never refreshed"""
+    job = queues[0].dequeue_any(queues, None, connection=conn)[0]
+    conn.zadd(f"rq:wip:{job.origin}", {job.id: time.time() - 100})
+    return job
+
+
+def test_abandoned_jobs_are_requeued_then_failed(rq_redis, monkeypatch):
+    from rq.registry import FailedJobRegistry
+
+    monkeypatch.setattr(settings, "BUILD_CHECK_MAX_ATTEMPTS", 2)
+    queues = list(worker.build_queues().values())
+    executor = build_checks.BuildCheckExecutor(queues)
+    assert worker.enqueue_build_check("q_1")
+
+    _abandon(rq_redis, queues)
+    executor._heartbeat()
+    assert worker.build_queues()["build_check"].count == 1
+    assert executor.recovered == 1
+
+    job = _abandon(rq_redis, queues)
+    executor._heartbeat()
+    assert worker.build_queues()["build_check"].count == 0
+    assert job.id in FailedJobRegistry("build_check", connection=rq_redis).get_job_ids()
+    assert not rq_redis.exists("build_check:claim:q_1")  # can be enqueued again
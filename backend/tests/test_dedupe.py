@@ -0,0 +1,43 @@
+"""Question dedupe when Postgres can't provide pg_trgm."""
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import dedupe, models
+
+
+class _NoExtensionsEngine:
+    """Postgres engine whose role may not CREATE EXTENSION"""
+
+    class dialect:
+        name = "postgresql"
+
+    def begin(self):
+        raise OperationalError("CREATE EXTENSION pg_trgm", {}, Exception("permission denied"))
+
+
+@pytest.fixture
+def deduper(monkeypatch):
+    fresh = dedupe.QuestionDeduper()
+    monkeypatch.setattr(dedupe, "question_deduper", fresh)
+    return fresh
+
+
+def test_failed_setup_is_recorded(deduper):
+    deduper.pg_trigram = True
+    assert dedupe.ensure_similarity_index(_NoExtensionsEngine()) is False
+    assert deduper.pg_trigram is False
+
+
+def test_degraded_postgres_uses_local_index(deduper, sqlite_db, monkeypatch):
+    sqlite_db.add(models.Question(id="q_1", title="Pensiile cresc cu 10% din ianuarie", status="open"))
+    sqlite_db.commit()
+    dedupe.ensure_similarity_index(_NoExtensionsEngine())
+    # Looks like Postgres, but the trigram SQL would fail: it must not be issued
+    monkeypatch.setattr(sqlite_db.get_bind().dialect, "name", "postgresql")
+
+    match = deduper.find_similar(sqlite_db, "Pensiile cresc cu 10% din ianuarie?")
+
+    assert match is not None
+    question, score = match
+    assert question.id == "q_1"
+    assert dedupe.same_claim("Pensiile cresc cu 10% din ianuarie?", question.title, score)
@@ -0,0 +1,75 @@
+"""Stream consumers ack only after the aggregation pipeline ran; XAUTOCLAIM redelivers the rest."""
+import time
+
+import pytest
+
+from app.event_stream import GROUP, STREAM_KEY, EventAggregator, StreamConsumer
+from app.hot_scores import HOT_KEY
+from app.settings import settings
+
+
+def _publish(r, *uids):
+    ts = str(int(time.time()))
+    for uid in uids:
+        r.xadd(STREAM_KEY, {"type": "open", "uid": uid, "ts": ts, "fact_check_id": "fc_1"})
+
+
+def _hll_key():
+    return f"fc:fc_1:hll:{time.strftime('%Y%m%d%H', time.gmtime())}"
+
+
+def _pending(r):
+    return r.xpending(STREAM_KEY, GROUP)["pending"]
+
+
+def test_batch_is_acked_after_it_was_applied(fake_redis):
+    consumer = StreamConsumer(fake_redis, name="c1")
+    _publish(fake_redis, "u1", "u2")
+
+    assert consumer.read_batch(block_ms=10) == 2
+    assert _pending(fake_redis) == 0
+    assert fake_redis.pfcount(_hll_key()) == 2
+    assert fake_redis.zscore(HOT_KEY, "fc_1") is not None
+
+
+def test_crash_before_ack_is_redelivered_by_reclaim(fake_redis, monkeypatch):
+    crashed = StreamConsumer(fake_redis, name="crashed")
+    _publish(fake_redis, "u1", "u2")
+
+    def crash(self, pipe, fields):
+        raise RuntimeError("worker died mid-batch")
+
+    with monkeypatch.context() as m:
+        m.setattr(EventAggregator, "queue", crash)
+        with pytest.raises(RuntimeError):
+            crashed.read_batch(block_ms=10)
+
+    # Delivered to the dead consumer, never acked, nothing written
+    assert _pending(fake_redis) == 2
+    assert fake_redis.zcard(HOT_KEY) == 0
+
+    monkeypatch.setattr(settings, "EVENTS_STREAM_CLAIM_IDLE_MS", 0)
+    survivor = StreamConsumer(fake_redis, name="survivor")
+    assert survivor.read_batch(block_ms=10) == 0  # nothing new for the group
+    assert survivor.reclaim() == 2
+    assert _pending(fake_redis) == 0
+    assert fake_redis.pfcount(_hll_key()) == 2
+    assert fake_redis.zscore(HOT_KEY, "fc_1") is not None
+
+    # Acked entries are not claimed a second time
+    survivor._claim_cursor = "0-0"
+    assert survivor.reclaim() == 0
+    assert survivor.reclaimed == 2
+
+
+def test_reclaim_acks_trimmed_entries(fake_redis, monkeypatch):
+    crashed = StreamConsumer(fake_redis, name="crashed")
+    _publish(fake_redis, "u1")
+    with monkeypatch.context() as m:
+        m.setattr(EventAggregator, "apply", lambda self, entries: 0)
+        crashed.read_batch(block_ms=10)
+    fake_redis.xtrim(STREAM_KEY, maxlen=0)
+
+    monkeypatch.setattr(settings, "EVENTS_STREAM_CLAIM_IDLE_MS", 0)
+    assert StreamConsumer(fake_redis, name="survivor").reclaim() == 0
+    assert _pending(fake_redis) == 0
@@ -0,0 +1,84 @@
+"""Ingest-time hot score: the log-add-exp bump script and the decay it encodes."""
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.hot_scores import (
+    AGE_TAU_SECONDS,
+    CREATED_AT_KEY,
+    DEFAULT_AGE_HOURS,
+    HOT_KEY,
+    HotScorer,
+    decayed_value,
+    tau_seconds,
+    top_scores,
+    trim_hot,
+)
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+HLL = "fc:fc_1:hll:2026031012"
+
+
+@pytest.fixture
+def bump(fake_redis):
+    scorer = HotScorer(fake_redis)
+    # Published now, so the age offset is the baseline and decayed values read as plain weights
+    fake_redis.hset(CREATED_AT_KEY, "fc_1", NOW.timestamp())
+
+    def _bump(event_type, uid, at=NOW, hll=HLL):
+        pipe = fake_redis.pipeline(transaction=False)
+        scorer.bump(pipe, event_type, "fc_1", uid, hll, at.timestamp())
+        return pipe.execute()[0]
+
+    return _bump
+
+
+def _value(r, at=NOW):
+    return decayed_value(r.zscore(HOT_KEY, "fc_1"), at)
+
+
+def test_bump_adds_event_weights(fake_redis, bump):
+    assert bump("open", "u1") == 1
+    assert _value(fake_redis) == pytest.approx(1.0)
+
+    assert bump("share", "u2") == 1
+    assert _value(fake_redis) == pytest.approx(4.0)
+
+
+def test_repeat_open_counts_once_but_engagement_always_counts(fake_redis, bump):
+    bump("open", "u1")
+    assert bump("open", "u1") == 0
+    assert _value(fake_redis) == pytest.approx(1.0)
+
+    bump("read_complete", "u1")
+    bump("read_complete", "u1")
+    assert _value(fake_redis) == pytest.approx(7.0)
+
+
+def test_score_decays_with_time(fake_redis, bump):
+    bump("open", "u1")
+    later = NOW + timedelta(seconds=tau_seconds())
+    # The event weight decays over tau; the fact-check's own age discounts it on top
+    aged = math.exp(-tau_seconds() / AGE_TAU_SECONDS)
+    assert _value(fake_redis, later) == pytest.approx(math.exp(-1) * aged)
+
+    # An event at `later` adds its full (age-discounted) weight on top of the decayed one
+    bump("open", "u2", at=later, hll="fc:fc_1:hll:other")
+    assert _value(fake_redis, later) == pytest.approx((1 + math.exp(-1)) * aged)
+
+
+def test_missing_created_at_uses_default_age(fake_redis, bump):
+    fake_redis.hdel(CREATED_AT_KEY, "fc_1")
+    bump("open", "u1")
+    assert _value(fake_redis) == pytest.approx(math.exp(-DEFAULT_AGE_HOURS * 3600 / AGE_TAU_SECONDS))
+
+
+def test_trim_drops_decayed_members(fake_redis, bump):
+    bump("open", "u1")
+    assert trim_hot(fake_redis, NOW) == 0
+    assert set(top_scores(fake_redis, NOW)) == {"fc_1"}
+
+    much_later = NOW + timedelta(seconds=5 * tau_seconds())
+    assert trim_hot(fake_redis, much_later) == 1
+    assert fake_redis.zcard(HOT_KEY) == 0
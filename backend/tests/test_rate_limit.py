@@ -0,0 +1,90 @@
+"""GCRA limits in Redis and the client address they are keyed by."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from app import rate_limit
+from app.rate_limit import RateLimit, client_ip
+from app.settings import settings
+
+
+def _request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "client": (peer, 50000)})
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    def _trust(networks):
+        monkeypatch.setattr(settings, "TRUSTED_PROXIES", networks)
+        rate_limit._trusted_networks.cache_clear()
+
+    yield _trust
+    rate_limit._trusted_networks.cache_clear()
+
+
+@pytest.fixture
+def async_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(rate_limit, "get_async_redis", lambda: r)
+    monkeypatch.setattr(rate_limit, "_scripts", {})
+    monkeypatch.setattr(rate_limit, "_redis_backoff", rate_limit.Backoff(maximum=30.0))
+    return r
+
+
+def test_forwarded_for_ignored_from_untrusted_peer(trusted):
+    trusted("10.0.0.0/8")
+    assert client_ip(_request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+
+
+def test_forwarded_for_walked_right_to_left_from_trusted_proxy(trusted):
+    trusted("10.0.0.0/8")
+    assert client_ip(_request("10.0.0.1", "1.2.3.4")) == "1.2.3.4"
+    # A client-supplied leftmost hop is not believed past the first untrusted one
+    assert client_ip(_request("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.2")) == "1.2.3.4"
+    assert client_ip(_request("10.0.0.1")) == "10.0.0.1"
+
+
+def test_gcra_allows_the_burst_then_denies(async_redis):
+    limit = RateLimit("test", "3/hour")
+
+    async def run():
+        results = [await limit.check("rl:test:ip:1.2.3.4", limit.limit, limit.period) for _ in range(4)]
+        other = await limit.check("rl:test:ip:5.6.7.8", limit.limit, limit.period)
+        return results, other, await async_redis.pttl("rl:test:ip:1.2.3.4")
+
+    results, other, ttl_ms = asyncio.run(run())
+    # Decided by the Lua script, not the in-process fallback; the key lives while the burst is spent
+    assert rate_limit._redis_backoff.failures == 0
+    assert 3_500_000 < ttl_ms <= 3_600_000
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert [remaining for _, _, remaining in results[:3]] == [2, 1, 0]
+    # One request is emitted every period / limit = 20 minutes
+    assert results[3][1] == pytest.approx(1200, abs=1)
+    assert other[0] is True
+
+
+def test_spoofed_forwarded_for_does_not_buy_a_fresh_allowance(async_redis, trusted):
+    trusted("10.0.0.0/8")
+    limit = RateLimit("test", "2/hour")
+
+    async def call(forwarded):
+        response = Response()
+        await limit(_request("203.0.113.9", forwarded), response)
+        return response
+
+    async def run():
+        first = await call("1.1.1.1")
+        await call("2.2.2.2")
+        with pytest.raises(HTTPException) as denied:
+            await call("3.3.3.3")
+        return first, denied.value
+
+    first, denied = asyncio.run(run())
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert denied.status_code == 429
+    assert denied.headers["Retry-After"] == "1800"
+    assert limit.rejected == 1
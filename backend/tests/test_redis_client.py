@@ -0,0 +1,18 @@
+"""Clients are per process: nothing may keep using a parent's pool after a fork."""
+from app import redis_client, votes, worker
+from app.routers import analytics
+
+
+def test_forked_child_gets_fresh_clients(monkeypatch):
+    parent = redis_client.get_redis()
+    parent_rq = worker.rq_connection()
+    parent_publisher = analytics._publisher()
+
+    monkeypatch.setattr(redis_client.os, "getpid", lambda: -1)  # as seen from a forked child
+
+    child = redis_client.get_redis()
+    assert child is not parent
+    assert worker.rq_connection() is not parent_rq
+    assert worker.build_queues()["build_check"].connection is worker.rq_connection()
+    assert votes._script(votes._VOTE_SCRIPT).registered_client is child
+    assert analytics._publisher() is not parent_publisher
@@ -0,0 +1,74 @@
+"""Keyset pagination of search_checks.
+
+Runs on SQLite (FTS5) by default; set TEST_DATABASE_URL to a scratch
+Postgres database to exercise the tsvector path.
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.db import Base
+from app.search import ensure_search_index, search_checks
+
+
+@pytest.fixture
+def db(tmp_path):
+    url = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tmp_path / 'search.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.rollback()
+    session.query(models.Check).delete()
+    session.query(models.Question).delete()
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+def _add_checks(db, titles):
+    question = models.Question(id=f"q_{uuid.uuid4().hex[:10]}", title="Întrebare de test")
+    db.add(question)
+    db.flush()
+    for i, title in enumerate(titles):
+        db.add(models.Check(
+            id=f"c_{i:03d}", question_id=question.id, title=title, verdict="true",
+            summary="Pensiile cresc din ianuarie", status="published",
+        ))
+    db.commit()
+
+
+def _all_pages(db, q, limit):
+    pages, cursor = [], None
+    while True:
+        hits, cursor = search_checks(db, q, limit=limit, cursor=cursor)
+        pages.append([h["id"] for h in hits])
+        if not cursor:
+            return pages
+
+
+def test_tied_ranks_survive_page_boundary(db):
+    # Identical documents rank exactly the same; a page ends in the middle of the tie
+    _add_checks(db, ["Pensiile cresc din ianuarie"] * 5)
+    pages = _all_pages(db, "pensiile", limit=2)
+    ids = [i for page in pages for i in page]
+    assert ids == [f"c_{i:03d}" for i in range(5)]
+    assert [len(p) for p in pages] == [2, 2, 1]
+
+
+def test_pages_keep_rank_order(db):
+    _add_checks(db, ["Pensiile cresc", "Pensiile pensiile cresc", "Salariile cresc"] + ["Pensiile cresc"] * 2)
+    ranks = []
+    cursor = None
+    while True:
+        hits, cursor = search_checks(db, "pensiile", limit=2, cursor=cursor)
+        ranks += [h["rank"] for h in hits]
+        if not cursor:
+            break
+    assert len(ranks) == 5
+    assert ranks == sorted(ranks, reverse=True)
@@ -0,0 +1,72 @@
+"""Unique-reader series from hourly sketches, with daily sketches past the hourly retention."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import timeseries
+from app.analytics_rollup import rollup_hourly_sketches
+from app.settings import settings
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def hourly_retention(monkeypatch):
+    monkeypatch.setattr(settings, "HLL_HOURLY_KEEP_HOURS", 24)
+
+
+def _read(r, hours_ago, *readers):
+    hour = NOW - timedelta(hours=hours_ago)
+    r.pfadd(f"fc:fc_1:hll:{hour.strftime('%Y%m%d%H')}", *readers)
+
+
+def test_hourly_window(fake_redis):
+    _read(fake_redis, 2, "a", "b")
+    _read(fake_redis, 1, "b", "c")
+    _read(fake_redis, 0, "d")
+
+    result = timeseries.fact_check_series(fake_redis, ["fc_1"], 4, 1, now=NOW)
+
+    series = result["series"][0]
+    assert series["uniques"] == [0, 2, 2, 1]
+    assert series["cumulative"] == [0, 2, 3, 4]
+    # Warm: served from the cached finished part
+    assert timeseries.fact_check_series(fake_redis, ["fc_1"], 4, 1, now=NOW)["series"] == result["series"]
+
+
+def test_older_hours_come_from_daily_sketches(fake_redis):
+    _read(fake_redis, 30, "a", "b")  # 2026-03-09 06:00, past the hourly retention
+    _read(fake_redis, 26, "b", "c")  # 2026-03-09 10:00
+    _read(fake_redis, 3, "c", "d")
+    rollup_hourly_sketches(fake_redis, now=NOW)
+    assert not fake_redis.exists("fc:fc_1:hll:2026030906")
+
+    result = timeseries.fact_check_series(fake_redis, ["fc_1"], 48, 1, now=NOW)
+
+    series = result["series"][0]
+    assert result["buckets"][0] == "2026-03-08T13:00:00+00:00"
+    assert result["buckets"][1] == "2026-03-09T00:00:00+00:00"  # one bucket for the rolled-up part of the day
+    assert result["hourly_since"] == "2026-03-09T12:00:00+00:00"
+    assert series["uniques"][:2] == [0, 3]
+    assert series["total_uniques"] == 4
+    assert len(result["buckets"]) == 2 + 25
+
+
+def test_window_limited_to_daily_retention(fake_redis):
+    with pytest.raises(ValueError):
+        timeseries.fact_check_series(fake_redis, ["fc_1"], (settings.HLL_DAILY_RETENTION_DAYS + 1) * 24, 24, now=NOW)
+
+
+def test_cached_counts_without_their_sketch_are_recounted(fake_redis):
+    _read(fake_redis, 2, "a", "b")
+    _read(fake_redis, 0, "c")
+    timeseries.fact_check_series(fake_redis, ["fc_1"], 4, 1, now=NOW)
+    sketches = list(fake_redis.scan_iter("fc:fc_1:ts:*:hll"))
+    assert len(sketches) == 1
+    assert 0 < fake_redis.ttl(sketches[0]) <= fake_redis.ttl(sketches[0][:-len(":hll")])
+    fake_redis.delete(*sketches)  # evicted, JSON still cached
+
+    series = timeseries.fact_check_series(fake_redis, ["fc_1"], 4, 1, now=NOW)["series"][0]
+
+    assert series["cumulative"] == [0, 2, 2, 3]
+    assert fake_redis.exists(*sketches)
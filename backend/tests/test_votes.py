@@ -0,0 +1,91 @@
+"""Redis-buffered votes: the Lua script, the DB fallback and replay-safe flushing."""
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import models, votes
+from app.settings import settings
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    monkeypatch.setattr(votes, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(settings, "VOTE_THRESHOLD", 3)
+    return fake_redis
+
+
+@pytest.fixture
+def question(sqlite_db):
+    q = models.Question(id="q_1", title="Pensiile cresc din ianuarie", status="open", votes_count=0)
+    sqlite_db.add(q)
+    sqlite_db.commit()
+    return q
+
+
+def _count(redis, question):
+    return int(redis.get(f"votes:q:{question.id}:count"))
+
+
+def test_device_votes_once(redis, question):
+    assert votes.record_vote(question, "dev-a") == votes.VoteResult(True, 1, False)
+    assert votes.record_vote(question, "dev-a") == votes.VoteResult(False, 1, False)
+    assert votes.record_vote(question, None).votes_count == 2
+    assert redis.llen(votes.BUFFER_KEY) == 2
+
+
+def test_counter_starts_from_postgres_and_never_below_it(redis, question):
+    question.votes_count = 5
+    assert votes.record_vote(question, "dev-a").votes_count == 6
+    question.votes_count = 9  # e.g. fallback votes Redis never heard about
+    assert votes.record_vote(question, "dev-b").votes_count == 10
+
+
+def test_threshold_fires_once(redis, question):
+    fired = [votes.record_vote(question, f"dev-{i}").threshold_reached for i in range(5)]
+    assert fired == [False, False, True, False, False]
+
+
+def test_db_fallback_syncs_redis(redis, question, sqlite_db):
+    votes.record_vote(question, "dev-a")
+    result = votes.record_vote_db(sqlite_db, question, "dev-b")
+    assert result.accepted and question.votes_count == 1
+    assert _count(redis, question) == 2  # buffered vote + fallback vote
+    assert not votes.record_vote(question, "dev-b").accepted
+
+
+def test_db_fallback_fires_at_or_above_threshold(redis, question, sqlite_db, monkeypatch):
+    monkeypatch.setattr(votes, "_script", lambda source: _unavailable)  # Redis still down
+    question.votes_count = 4  # threshold lowered below an open question's count
+    sqlite_db.commit()
+    assert votes.record_vote_db(sqlite_db, question, "dev-a").threshold_reached
+    assert not votes.record_vote_db(sqlite_db, question, "dev-a").accepted
+
+
+def _unavailable(*args, **kwargs):
+    raise RedisConnectionError("down")
+
+
+def test_flush_writes_votes_and_counts(redis, question, sqlite_db):
+    for device in ("dev-a", "dev-b", None):
+        votes.record_vote(question, device)
+
+    assert votes.flush_votes(sqlite_db) == 3
+    sqlite_db.refresh(question)
+    assert question.votes_count == 3
+    assert sqlite_db.query(models.Vote).count() == 3
+    assert not redis.exists(votes.BUFFER_KEY) and not redis.exists(votes.FLUSHING_KEY)
+
+
+def test_flush_replay_after_crash_before_ltrim(redis, question, sqlite_db, monkeypatch):
+    for device in ("dev-a", "dev-b"):
+        votes.record_vote(question, device)
+    ltrim = redis.ltrim
+    monkeypatch.setattr(redis, "ltrim", _unavailable)
+    with pytest.raises(RedisConnectionError):
+        votes.flush_votes(sqlite_db)  # committed, but the entries are still in FLUSHING_KEY
+    monkeypatch.setattr(redis, "ltrim", ltrim)
+
+    assert votes.flush_votes(sqlite_db) == 0
+    sqlite_db.refresh(question)
+    assert question.votes_count == 2
+    assert sqlite_db.query(models.Vote).count() == 2
+    assert not redis.exists(votes.FLUSHING_KEY)
@@ -34,13 +34,10 @@ class ApiFactCheckRepository implements FactCheckRepositoryInterface {
   @override
   Future<List<FactCheck>> searchFactChecks(String query) async {
     try {
-      // For now, get all and filter locally
-      // In production, this would be a server-side search endpoint
-      final allChecks = await _api.getLatest(limit: 100);
-      final lowercaseQuery = query.toLowerCase();
-      return allChecks
-          .where((check) => check.title.toLowerCase().contains(lowercaseQuery))
-          .toList();
+      if (query.trim().length < 2) {
+        return [];
+      }
+      return await _api.search(query.trim());
     } catch (e) {
       debugPrint('Error searching fact checks: $e');
       return [];
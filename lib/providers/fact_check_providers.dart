@@ -16,7 +16,9 @@ final apiServiceProvider = Provider((ref) => ApiService());
 // Analytics service provider
 final analyticsServiceProvider = Provider((ref) {
   final apiService = ref.watch(apiServiceProvider);
-  return AnalyticsService(apiService.dio);
+  final service = AnalyticsService(apiService.dio);
+  ref.onDispose(service.dispose);
+  return service;
 });
 
 // Repository provider - switches between mock and real API
@@ -1,4 +1,6 @@
 // lib/services/analytics_service.dart
+import 'dart:async';
+
 import 'package:flutter/foundation.dart';
 import 'package:uuid/uuid.dart';
 import 'package:shared_preferences/shared_preferences.dart';
@@ -10,8 +12,71 @@ class AnalyticsService {
   static const String _lastOpenKey = 'last_open_';
   static const Duration _openCooldown = Duration(seconds: 30);
 
+  // Events are queued and sent together to /events/batch
+  static const int _batchSize = 20;
+  static const int _maxPending = 200;
+  static const Duration _flushDelay = Duration(seconds: 5);
+
+  final List<Map<String, dynamic>> _pending = [];
+  Timer? _flushTimer;
+  bool _flushing = false;
+
   AnalyticsService(this._dio);
 
+  void _enqueue(Map<String, dynamic> event) {
+    // Stable id per event: a retried batch is deduplicated server-side
+    event['event_id'] ??= const Uuid().v4();
+    _pending.add(event);
+    if (_pending.length > _maxPending) {
+      _pending.removeRange(0, _pending.length - _maxPending); // drop oldest
+    }
+    if (_pending.length >= _batchSize) {
+      unawaited(flush());
+    } else {
+      _flushTimer ??= Timer(_flushDelay, () => unawaited(flush()));
+    }
+  }
+
+  /// Send every queued event in one request
+  Future<void> flush() async {
+    _flushTimer?.cancel();
+    _flushTimer = null;
+    if (_flushing || _pending.isEmpty) return;
+
+    _flushing = true;
+    final batch = List<Map<String, dynamic>>.of(_pending);
+    _pending.clear();
+    try {
+      await _dio.post('/events/batch', data: {'events': batch});
+    } on DioException catch (e) {
+      final status = e.response?.statusCode ?? 0;
+      if (status < 400 || status >= 500) {
+        // Network/server error: keep them for the next flush (bounded by _maxPending)
+        _requeue(batch);
+      }
+      debugPrint('Analytics error: $e');
+    } catch (e) {
+      debugPrint('Analytics error: $e');
+    } finally {
+      _flushing = false;
+    }
+    if (_pending.isNotEmpty) {
+      _flushTimer ??= Timer(_flushDelay, () => unawaited(flush()));
+    }
+  }
+
+  void _requeue(List<Map<String, dynamic>> batch) {
+    _pending.insertAll(0, batch);
+    if (_pending.length > _maxPending) {
+      _pending.removeRange(0, _pending.length - _maxPending);
+    }
+  }
+
+  void dispose() {
+    _flushTimer?.cancel();
+    unawaited(flush());
+  }
+
   /// Get or create anonymous user ID for tracking
   Future<String> getAnonId() async {
     final prefs = await SharedPreferences.getInstance();
@@ -37,15 +102,12 @@ class AnalyticsService {
 
     try {
       final uid = await getAnonId();
-      await _dio.post(
-        '/events',
-        data: {
-          'type': 'open',
-          'fact_check_id': factCheckId,
-          'uid': uid,
-          'ts': DateTime.now().toUtc().toIso8601String(),
-        },
-      );
+      _enqueue({
+        'type': 'open',
+        'fact_check_id': factCheckId,
+        'uid': uid,
+        'ts': DateTime.now().toUtc().toIso8601String(),
+      });
 
       // Record this tracking event to prevent spam
       await prefs.setInt(lastOpenKey, now);
@@ -62,15 +124,12 @@ class AnalyticsService {
   ) async {
     try {
       final uid = await getAnonId();
-      await _dio.post(
-        '/events',
-        data: {
-          'type': engagementType, // 'read_complete', 'share', 'bookmark'
-          'fact_check_id': factCheckId,
-          'uid': uid,
-          'ts': DateTime.now().toUtc().toIso8601String(),
-        },
-      );
+      _enqueue({
+        'type': engagementType, // 'read_complete', 'share', 'bookmark'
+        'fact_check_id': factCheckId,
+        'uid': uid,
+        'ts': DateTime.now().toUtc().toIso8601String(),
+      });
     } catch (e) {
       debugPrint('Analytics error: $e');
     }
@@ -80,16 +139,13 @@ class AnalyticsService {
   Future<void> trackSearch(String query, int resultCount) async {
     try {
       final uid = await getAnonId();
-      await _dio.post(
-        '/events',
-        data: {
-          'type': 'search',
-          'query': query.toLowerCase().trim(),
-          'result_count': resultCount,
-          'uid': uid,
-          'ts': DateTime.now().toUtc().toIso8601String(),
-        },
-      );
+      _enqueue({
+        'type': 'search',
+        'query': query.toLowerCase().trim(),
+        'result_count': resultCount,
+        'uid': uid,
+        'ts': DateTime.now().toUtc().toIso8601String(),
+      });
     } catch (e) {
       debugPrint('Analytics error: $e');
     }
@@ -99,16 +155,13 @@ class AnalyticsService {
   Future<void> trackQuestion(String question, String? category) async {
     try {
       final uid = await getAnonId();
-      await _dio.post(
-        '/events',
-        data: {
-          'type': 'question',
-          'question': question.toLowerCase().trim(),
-          'category': category ?? 'general',
-          'uid': uid,
-          'ts': DateTime.now().toUtc().toIso8601String(),
-        },
-      );
+      _enqueue({
+        'type': 'question',
+        'question': question.toLowerCase().trim(),
+        'category': category ?? 'general',
+        'uid': uid,
+        'ts': DateTime.now().toUtc().toIso8601String(),
+      });
     } catch (e) {
       debugPrint('Analytics error: $e');
     }
@@ -51,6 +51,30 @@ class FactChecksApi {
     }
   }
 
+  /// Server-side full-text search (ranked, diacritics optional)
+  Future<List<FactCheck>> search(
+    String query, {
+    List<String>? categories,
+    int limit = 20,
+  }) async {
+    try {
+      final response = await _apiService.dio.get(
+        '/fact-checks/search',
+        queryParameters: {
+          'q': query,
+          'limit': limit,
+          if (categories != null && categories.isNotEmpty)
+            'categories': categories.join(','),
+        },
+      );
+
+      final List<dynamic> data = response.data['items'] as List;
+      return data.map((json) => _factCheckFromApi(json)).toList();
+    } on DioException catch (e) {
+      throw Exception('Failed to search fact checks: ${e.message}');
+    }
+  }
+
   /// Generate a new fact-check using AI
   Future<FactCheck> generateWithAI({
     required String question,
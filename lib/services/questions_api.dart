@@ -1,20 +1,41 @@
 import 'package:dio/dio.dart';
 import '../services/api_service.dart';
 
+/// Thrown when the backend found a similar (but not identical) question.
+/// Show [duplicateOf] to the user; resubmit with `force: true` to create anyway.
+class SimilarQuestionException implements Exception {
+  final Map<String, dynamic> duplicateOf;
+
+  SimilarQuestionException(this.duplicateOf);
+
+  @override
+  String toString() => 'Similar question exists: ${duplicateOf['title']}';
+}
+
 class QuestionsApi {
   final ApiService _apiService;
 
   QuestionsApi(this._apiService);
 
   /// Create a new question
-  Future<Map<String, dynamic>> create(String title, {String? body}) async {
+  Future<Map<String, dynamic>> create(
+    String title, {
+    String? body,
+    bool force = false,
+  }) async {
     try {
       final response = await _apiService.dio.post(
         '/questions',
-        data: {'title': title, 'body': body},
+        data: {'title': title, 'body': body, if (force) 'force': true},
       );
       return response.data as Map<String, dynamic>;
     } on DioException catch (e) {
+      final detail = e.response?.data is Map ? e.response!.data['detail'] : null;
+      if (e.response?.statusCode == 409 && detail is Map && detail['duplicate_of'] is Map) {
+        throw SimilarQuestionException(
+          Map<String, dynamic>.from(detail['duplicate_of'] as Map),
+        );
+      }
       throw Exception('Failed to create question: ${e.message}');
     }
   }